@@ -0,0 +1,130 @@
+"""
+准入控制
+按解码后的像素数与转换参数估算每个请求的峰值内存，在全局内存预算与并发上限内放行；
+预算不足时按到达顺序短暂排队，超时则抛出 Overloaded，由视图返回 503 + Retry-After
+"""
+
+import collections
+import contextlib
+import os
+import threading
+import time
+
+from metrics import add_time
+
+# 全局内存预算（字节）与同时执行的重型请求数
+ADMISSION_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024
+ADMISSION_MAX_ACTIVE = os.cpu_count() or 2
+# 预算不足时最长排队时间（秒），超时返回 503
+ADMISSION_QUEUE_TIMEOUT = 10.0
+# 503 响应建议客户端重试的间隔（秒）
+ADMISSION_RETRY_AFTER = 5
+
+# 每像素的峰值内存估算（字节，不含已缓存的解码图像），按 2000x1500 合成图纸实测的上限取整：
+# 基础流水线（灰度、二值图、轮廓、DXF 输出）
+BASE_BYTES_PER_PIXEL = 8
+# 单线条模式的骨架化与中心线追踪
+SINGLE_LINE_BYTES_PER_PIXEL = 40
+# 增加曲线数量模式，按插值倍数线性增加
+POINT_BYTES_PER_PIXEL = 1.2
+# 曲线边缘模式的样条拟合与采样
+CURVE_BYTES_PER_PIXEL = 12
+
+
+class Overloaded(Exception):
+    """服务器繁忙：排队超时仍无法放行"""
+
+    def __init__(self, retry_after=ADMISSION_RETRY_AFTER):
+        super().__init__(f"服务器繁忙，请 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+def estimate_cost(pixels, single_line=False, high_precision='none', levels=1):
+    """估算一次预处理/转换的峰值内存（字节）；多阈值分层输出时各层的中间结果同时存在，按层数计
+
+    pixels 为实际处理的像素数：全分辨率模式按原图分块处理，传入原图的像素数。
+    """
+    per_pixel = BASE_BYTES_PER_PIXEL
+    if single_line:
+        per_pixel += SINGLE_LINE_BYTES_PER_PIXEL
+    if high_precision.startswith('more_points_'):
+        per_pixel += POINT_BYTES_PER_PIXEL * int(high_precision.rsplit('_', 1)[1])
+    elif high_precision == 'curve_edge':
+        per_pixel += CURVE_BYTES_PER_PIXEL
+    return int(pixels * per_pixel * max(levels, 1))
+
+
+class AdmissionController:
+    """内存预算 + 并发上限的准入控制，等待者按到达顺序放行，大请求不会被小请求饿死
+
+    单个请求的估算超过整个预算时按整个预算计，即在没有其他请求执行时单独放行
+    （无法估算的请求可传入 float('inf')）。
+    """
+
+    def __init__(self, budget=ADMISSION_MEMORY_BUDGET, max_active=ADMISSION_MAX_ACTIVE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.budget = budget
+        self.max_active = max_active
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self.active = 0
+        self.rejected = 0
+        self._waiters = collections.deque()
+        self._cond = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def _fits(self, cost):
+        return self.active < self.max_active and self.in_use + cost <= self.budget
+
+    def acquire(self, cost, timeout=None):
+        """占用 cost 字节的预算，返回实际占用量（用于 release）；排队超时抛出 Overloaded"""
+        cost = min(cost, self.budget)
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                deadline = time.monotonic() + timeout
+                while self._waiters[0] is not ticket or not self._fits(cost):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise Overloaded()
+                    self._cond.wait(remaining)
+                self.in_use += cost
+                self.active += 1
+            finally:
+                self._waiters.remove(ticket)
+                # 队首变化，后面的等待者可能已经可以放行
+                self._cond.notify_all()
+        add_time('admission_wait', time.perf_counter() - start)
+        return cost
+
+    def try_acquire(self, cost):
+        """不排队：没有等待者且预算足够时立即占用并返回占用量，否则返回 None"""
+        cost = min(cost, self.budget)
+        with self._cond:
+            if self._waiters or not self._fits(cost):
+                return None
+            self.in_use += cost
+            self.active += 1
+        return cost
+
+    def release(self, cost):
+        with self._cond:
+            self.in_use -= cost
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, cost, timeout=None):
+        """在 with 块内占用预算"""
+        granted = self.acquire(cost, timeout)
+        try:
+            yield
+        finally:
+            self.release(granted)
@@ -0,0 +1,218 @@
+"""
+批量转换
+多张图片或 zip 压缩包使用同一组参数在任务进程池中并行转换，
+每完成一张就写入流式 zip 响应，不必等全部完成。
+每张图片提交前按头部尺寸占用准入预算，任务结束时释放
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from admission import Overloaded, estimate_cost
+from jobs import JOB_WORKERS
+from output_formats import output_filename
+from pipeline import MAX_WIDTH, decoded_pixels, source_pixels
+from vectorize import convert_image_file
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+# 同时提交到进程池的图片数，限制已读入内存的待转换图片
+BATCH_IN_FLIGHT = 2 * JOB_WORKERS
+
+
+class _ZipStream(io.RawIOBase):
+    """不可 seek 的写入缓冲，zipfile 写入后由生成器取走已完成的字节"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _spool(stream):
+    """把上传文件复制到磁盘临时文件，不读入内存"""
+    spool = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(stream, spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_uploaded_images(files, archive=None):
+    """返回逐个产出 (文件名, 字节) 的生成器：先是上传的图片，再是 zip 中的图片
+
+    上传文件在视图返回后即被关闭，因此调用时先把图片与压缩包复制到磁盘临时文件，
+    并立即解析 zip 目录，损坏的压缩包在开始响应前就会抛出 BadZipFile。
+    图片在提交转换时才逐张读入内存。
+    """
+    uploads = []
+    zf = spool = None
+    try:
+        for file in files:
+            uploads.append((file.filename or 'image', _spool(file.stream)))
+        if archive is not None:
+            spool = _spool(archive.stream)
+            zf = zipfile.ZipFile(spool)
+    except Exception:
+        for _, upload in uploads:
+            upload.close()
+        if spool is not None:
+            spool.close()
+        raise
+    return _iter_images(uploads, zf, spool)
+
+
+def _iter_images(uploads, zf, spool):
+    try:
+        while uploads:
+            name, upload = uploads.pop(0)
+            with upload:
+                data = upload.read()
+            yield name, data
+        if zf is None:
+            return
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            if os.path.splitext(info.filename)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            yield info.filename, zf.read(info)
+    finally:
+        for _, upload in uploads:
+            upload.close()
+        if zf is not None:
+            zf.close()
+            spool.close()
+
+
+def image_cost(data, params):
+    """按头部尺寸估算一张图片转换的准入成本
+
+    无法读取尺寸的格式按 MAX_WIDTH 见方计；全分辨率模式按原图尺寸计，尺寸未知时按整个预算计。
+    """
+    if params['full_resolution']:
+        pixels = source_pixels(data)
+        if pixels is None:
+            return float('inf')
+    else:
+        pixels = decoded_pixels(data) or MAX_WIDTH * MAX_WIDTH
+    return estimate_cost(pixels, params['single_line'], params['high_precision'], levels=len(params['thresholds']))
+
+
+def admit_first(admission, images, params):
+    """取出第一张图片并占用其准入预算，返回 (文件名, 字节, 占用量)，没有图片时返回 None
+
+    在开始响应之前调用，排队超时抛出 Overloaded，由视图返回 503。
+    """
+    for name, data in images:
+        return name, data, admission.acquire(image_cost(data, params))
+    return None
+
+
+def _output_name(name, used, fmt='dxf'):
+    """把图片文件名转换为不重复的输出文件名，扩展名由输出格式决定"""
+    base = os.path.splitext(os.path.basename(name.replace('\\', '/')))[0] or 'image'
+    candidate = output_filename(base, fmt)
+    n = 1
+    while candidate in used:
+        n += 1
+        candidate = output_filename(f'{base}_{n}', fmt)
+    used.add(candidate)
+    return candidate
+
+
+def stream_batch_zip(job_manager, admission, images, params, folder, first=None):
+    """并行转换 images 中的图片，按完成顺序产出 zip 数据块
+
+    first 为 admit_first 已占用预算的第一张图片。之后的图片在有任务执行时只在预算空闲时提交，
+    否则等待已提交的任务完成；没有任务执行时按正常超时排队。
+    转换失败（含排队超时）的图片记录在压缩包末尾的 errors.txt 中；客户端断开时取消剩余任务。
+    """
+    stream = _ZipStream()
+    zf = zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED)
+    # future → (任务, 文件名, 占用的预算)
+    pending = {}
+    used_names = set()
+    errors = []
+    images = iter(images)
+    exhausted = False
+
+    try:
+        while True:
+            # 补充任务，保持进程池忙碌但不一次读入全部图片
+            while not exhausted and len(pending) < BATCH_IN_FLIGHT:
+                if first is None:
+                    try:
+                        name, data = next(images)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    first = (name, data, None)
+                name, data, cost = first
+                if cost is None and pending:
+                    cost = admission.try_acquire(image_cost(data, params))
+                    if cost is None:
+                        # 预算已满：等已提交的任务完成、释放预算后再提交
+                        break
+                elif cost is None:
+                    try:
+                        cost = admission.acquire(image_cost(data, params))
+                    except Overloaded as e:
+                        errors.append(f'{name}: {e}')
+                        first = None
+                        continue
+                first = None
+                job_id = uuid.uuid4().hex
+                path = os.path.join(folder, output_filename(job_id, params['output_format']))
+                try:
+                    job = job_manager.submit(job_id, convert_image_file, (data, params, path), files=[path])
+                except Exception:
+                    admission.release(cost)
+                    raise
+                pending[job.future] = (job, name, cost)
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, name, cost = pending.pop(future)
+                admission.release(cost)
+                exc = None if future.cancelled() else future.exception()
+                if exc is None and not future.cancelled():
+                    zf.write(job.files[0], _output_name(name, used_names, params['output_format']))
+                else:
+                    errors.append(f'{name}: {exc or "cancelled"}')
+                job_manager.discard(job.id)
+                yield stream.drain()
+
+        if errors:
+            zf.writestr('errors.txt', '\n'.join(errors) + '\n')
+        zf.close()
+        yield stream.drain()
+    finally:
+        for job, _, cost in pending.values():
+            job_manager.discard(job.id)
+            admission.release(cost)
+        if first is not None and first[2] is not None:
+            admission.release(first[2])
+        close = getattr(images, 'close', None)
+        if close is not None:
+            # 删除尚未读取的上传临时文件
+            close()
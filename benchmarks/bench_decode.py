@@ -0,0 +1,115 @@
+"""
+大尺寸上传的解码基准测试
+对比旧的解码方式（完整分辨率 BGR 解码 → 缩放）与 decode_image（大尺寸 JPEG 缩小解码为灰度），
+每种方式在独立子进程中运行，记录解码耗时（多次取最小值）与峰值内存增量，并比较两者输出的差异
+
+用法: python benchmarks/bench_decode.py [--sizes 4000x3000 12000x9000] [--formats jpg png]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_drawing
+
+
+def reference_decode(data):
+    """旧实现：完整分辨率解码为 BGR，缩放到 MAX_WIDTH 后再灰度化"""
+    import cv2
+    import numpy as np
+    from pipeline import MAX_WIDTH
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    h, w = img.shape[:2]
+    if w > MAX_WIDTH:
+        img = cv2.resize(img, (MAX_WIDTH, int(h * MAX_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def new_decode(data):
+    from pipeline import decode_image
+    return decode_image(data)
+
+
+def encode(kind, width, height, fmt):
+    """合成图纸编码为上传文件；JPEG 使用扫描件/照片常见的质量 90"""
+    import cv2
+    img = make_drawing(kind, width, height)
+    params = [cv2.IMWRITE_JPEG_QUALITY, 90] if fmt == 'jpg' else []
+    return cv2.imencode(f'.{fmt}', img, params)[1].tobytes()
+
+
+def _reset_peak():
+    """重置峰值内存计数（Linux 4.0+）；子进程从父进程继承了生成测试图时的峰值"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    # Linux 上 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run(method, data, repeat):
+    """在子进程中运行，返回 (最小耗时, 峰值内存增量, 输出图像)"""
+    import cv2  # noqa: F401  预先导入，导入开销不计入内存增量
+    import pipeline  # noqa: F401
+    decode = reference_decode if method == 'reference' else new_decode
+    _reset_peak()
+    base = _peak_bytes()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        img = decode(data)
+        best = min(best, time.perf_counter() - start)
+    return best, _peak_bytes() - base, img
+
+
+def main():
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['4000x3000', '12000x9000'])
+    parser.add_argument('--formats', nargs='+', choices=('jpg', 'png'), default=['jpg', 'png'])
+    parser.add_argument('--kind', default='noisy_scan')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split('x'))
+        for fmt in args.formats:
+            data = encode(args.kind, width, height, fmt)
+            results = {}
+            for method in ('reference', 'decode_image'):
+                with ctx.Pool(1) as pool:
+                    results[method] = pool.apply(run, (method, data, args.repeat))
+            ref, new = results['reference'], results['decode_image']
+            same_shape = ref[2].shape == new[2].shape
+            diff = np.abs(ref[2].astype(np.int16) - new[2]).mean() if same_shape else float('nan')
+            print(f"{size} {fmt} ({len(data) / 1e6:.1f} MB)：")
+            for method, (seconds, peak, _) in results.items():
+                print(f"  {method:>12}: {seconds * 1000:7.1f} ms，峰值内存 +{peak / 1e6:7.1f} MB")
+            # 增量不足 1 MB 时按 1 MB 计，避免比值失真
+            print(f"  加速 {ref[0] / new[0]:.1f}x，内存 {max(ref[1], 1e6) / max(new[1], 1e6):.1f}x，"
+                  f"尺寸一致: {same_shape}，平均灰度差 {diff:.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
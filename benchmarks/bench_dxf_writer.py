@@ -0,0 +1,75 @@
+"""
+直接组码输出与 ezdxf 对象模型的对比基准
+对同一组轮廓分别用两种方式构建并写出 ASCII DXF，记录构建与序列化耗时（多次取最小值），
+并校验两者的 ENTITIES 段逐字节一致
+
+用法: python benchmarks/bench_dxf_writer.py [--size 4000x3000] [--high-precision more_points_8]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_png
+
+
+def entities_section(data):
+    text = data.decode('cp1252')
+    begin = text.index('ENTITIES\n')
+    return text[begin:text.index('ENDSEC\n', begin)]
+
+
+def build_and_write(kind, img, params, direct):
+    """返回 (构建耗时, 序列化耗时, 输出字节)；轮廓等前序阶段由流水线缓存，不计入"""
+    import vectorize
+    from metrics import collect
+    from output_formats import write_document
+
+    vectorize.DIRECT_DXF_WRITER = direct
+    with collect() as metrics:
+        doc, _ = vectorize.convert(kind, img, params)
+    build = metrics.as_dict()['stages'].get('dxf_build', 0.0)
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    write_document(doc, buffer, params['output_format'])
+    return build, time.perf_counter() - start, buffer.getvalue()
+
+
+def main():
+    from pipeline import decode_image
+    from vectorize import parse_convert_params
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='4000x3000', help='图纸尺寸，如 4000x3000')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--fill-color', default='black', choices=('none', 'black', 'white'))
+    parser.add_argument('--high-precision', default='none')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    params = parse_convert_params({'fill_color': args.fill_color, 'high_precision': args.high_precision})
+    print(f"尺寸 {width}x{height}，fill={args.fill_color}，high_precision={args.high_precision}")
+    for kind in args.kinds:
+        img = decode_image(make_png(kind, width, height))
+        results = {}
+        for direct in (False, True):
+            runs = [build_and_write(kind, img, params, direct) for _ in range(args.repeat)]
+            results[direct] = (min(r[0] for r in runs), min(r[1] for r in runs), runs[-1][2])
+        identical = entities_section(results[False][2]) == entities_section(results[True][2])
+        for direct, name in ((False, 'ezdxf'), (True, 'direct')):
+            build, write, data = results[direct]
+            print(f"{kind:>10} {name:>6}: 构建 {build * 1000:7.1f} ms，序列化 {write * 1000:7.1f} ms，"
+                  f"合计 {(build + write) * 1000:7.1f} ms，{len(data) / 1e6:6.2f} MB")
+        speedup = sum(results[False][:2]) / sum(results[True][:2])
+        print(f"{kind:>10}  加速比 {speedup:.1f}x，ENTITIES 段一致: {identical}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+输出格式的基准测试
+对同一组合成图纸的转换结果，分别用每种输出格式序列化，记录写入耗时（多次取最小值）、
+输出字节数及相对 ASCII DXF 的比例；DXF 类格式还记录 ezdxf 读回的耗时
+
+用法: python benchmarks/bench_formats.py [--size 2000x1500] [--high-precision curve_edge] [--no-read]
+"""
+
+import argparse
+import gzip
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_png
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def encode(doc, fmt):
+    from output_formats import write_document
+    buffer = io.BytesIO()
+    write_document(doc, buffer, fmt)
+    return buffer.getvalue()
+
+
+def read_back(data, fmt):
+    """用 ezdxf 解析输出（压缩格式先解压），返回实体数；SVG 不解析"""
+    import ezdxf
+    if fmt == 'dxf_gz':
+        data = gzip.decompress(data)
+    elif fmt == 'dxf_zip':
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            data = zf.read(zf.namelist()[0])
+    # ezdxf.readfile 自动识别 ASCII 与二进制 DXF
+    with tempfile.NamedTemporaryFile(suffix='.dxf', delete=False) as f:
+        f.write(data)
+    try:
+        return len(ezdxf.readfile(f.name).modelspace())
+    finally:
+        os.remove(f.name)
+
+
+def main():
+    from output_formats import OUTPUT_FORMATS
+    from pipeline import decode_image
+    from vectorize import CURVE_OUTPUTS, convert, parse_convert_params
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='2000x1500', help='图纸尺寸，如 2000x1500')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--fill-color', default='none', choices=('none', 'black', 'white'))
+    parser.add_argument('--high-precision', default='none')
+    parser.add_argument('--curve-output', default='polyline', choices=CURVE_OUTPUTS)
+    parser.add_argument('--formats', nargs='+', choices=list(OUTPUT_FORMATS), default=list(OUTPUT_FORMATS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-read', action='store_true', help='不测量读回耗时')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    params = parse_convert_params({
+        'fill_color': args.fill_color,
+        'high_precision': args.high_precision,
+        'curve_output': args.curve_output,
+    })
+    print(f"尺寸 {width}x{height}，fill={args.fill_color}，high_precision={args.high_precision}，"
+          f"curve_output={args.curve_output}，写入重复 {args.repeat} 次")
+    for kind in args.kinds:
+        # 与上传文件走同一条解码路径
+        img = decode_image(make_png(kind, width, height))
+        doc, stats = convert(kind, img, params)
+        print(f"{kind}：{stats['curves']} 条曲线，{stats['vertices_after']} 个顶点")
+        baseline = None
+        for fmt in args.formats:
+            seconds, data = best_of(lambda: encode(doc, fmt), args.repeat)
+            baseline = baseline or (seconds, len(data))
+            line = (f"  {fmt:>10}: 写入 {seconds * 1000:7.1f} ms ({seconds / baseline[0]:4.2f}x)，"
+                    f"{len(data) / 1e6:7.2f} MB ({len(data) / baseline[1]:5.1%})")
+            if not args.no_read and fmt != 'svg':
+                read_seconds, entities = best_of(lambda: read_back(data, fmt), 1)
+                line += f"，读回 {read_seconds * 1000:7.1f} ms（{entities} 个实体）"
+            print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+多阈值分层输出的基准测试
+对比逐个阈值分别转换（每次重新解码、灰度化，相当于 N 次 /convert_dxf 上传）与一次分层转换
+（共用解码结果，各层在线程池中并行）的总耗时，并校验每层的曲线数与单阈值转换一致
+
+用法: python benchmarks/bench_layers.py [--size 4000x3000] [--thresholds 64 128 192] [--workers 4]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_png
+
+
+def convert_bytes(data, params):
+    """解码并转换一次，返回 (统计信息, 输出字节)；清空阶段缓存，与独立请求一样重新计算"""
+    from output_formats import write_document
+    from pipeline import decode_image, stage_cache
+    from vectorize import convert
+
+    stage_cache.clear()
+    img = decode_image(data)
+    source = data if params['full_resolution'] else None
+    doc, stats = convert(f'bench-{time.perf_counter()}', img, params, source=source)
+    buffer = io.BytesIO()
+    write_document(doc, buffer, params['output_format'])
+    return stats, buffer.getvalue()
+
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    import vectorize
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='4000x3000', help='图纸尺寸，如 4000x3000')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=['line_art', 'noisy_scan'])
+    parser.add_argument('--thresholds', nargs='+', type=int, default=[64, 128, 192])
+    parser.add_argument('--fill-color', default='none', choices=('none', 'black', 'white'))
+    parser.add_argument('--full-resolution', action='store_true')
+    parser.add_argument('--workers', type=int, default=vectorize.LEVEL_WORKERS, help='分层并行的线程数')
+    args = parser.parse_args()
+
+    vectorize.LEVEL_WORKERS = args.workers
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    form = {'fill_color': args.fill_color, 'full_resolution': str(args.full_resolution).lower()}
+    thresholds = ' '.join(str(t) for t in args.thresholds)
+    print(f"尺寸 {width}x{height}，阈值 {thresholds}，{args.workers} 个线程（{os.cpu_count()} 核）")
+    for kind in args.kinds:
+        data = make_png(kind, width, height)
+
+        start = time.perf_counter()
+        separate = [convert_bytes(data, vectorize.parse_convert_params({**form, 'threshold': str(t)}))
+                    for t in args.thresholds]
+        separate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats, layered = convert_bytes(data, vectorize.parse_convert_params({**form, 'thresholds': thresholds}))
+        layered_seconds = time.perf_counter() - start
+
+        matches = [layer['curves'] for layer in stats['layers']] == [s['curves'] for s, _ in separate]
+        print(f"{kind:>10}: 逐个阈值 {separate_seconds * 1000:8.1f} ms，分层一次 {layered_seconds * 1000:8.1f} ms"
+              f"（{separate_seconds / layered_seconds:.1f}x），"
+              f"{len(layered) / 1e6:.2f} MB，各层曲线数一致: {matches}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
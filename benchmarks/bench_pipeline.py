@@ -0,0 +1,302 @@
+"""
+图片转 DXF 流水线的基准测试
+离线生成合成图纸（线稿、填充图形、文字、带噪扫描件），按多种分辨率和
+single_line × ignore_border × fill_color × high_precision 的全部组合调用 /convert_dxf，
+记录耗时、峰值内存、实体数和 DXF 字节数到 JSON，并可与基线对比标记性能回退
+
+用法:
+    python benchmarks/bench_pipeline.py --quick
+    python benchmarks/bench_pipeline.py --output result.json --save-baseline baseline.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json [--tolerance 0.15]
+"""
+
+import argparse
+import datetime
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_drawing, make_png
+
+SIZES = ((800, 600), (2000, 1500), (4000, 3000))
+FILL_COLORS = ('none', 'black')
+HIGH_PRECISION = ('none', 'more_points_8', 'more_points_64', 'curve_edge')
+# --quick：只跑最小尺寸和两种精度，用于提交前的快速检查
+QUICK_SIZES = ((800, 600),)
+QUICK_HIGH_PRECISION = ('none', 'more_points_8')
+# 耗时超过基线 (1 + tolerance) 倍且绝对差值超过 MIN_DELTA 秒才算回退，避免小用例的抖动误报
+DEFAULT_TOLERANCE = 0.15
+MIN_DELTA = 0.05
+
+
+def case_id(case):
+    return (f"{case['kind']}-{case['width']}x{case['height']}"
+            f"-sl{int(case['single_line'])}-ib{int(case['ignore_border'])}"
+            f"-{case['fill_color']}-{case['high_precision']}")
+
+
+def build_cases(kinds, sizes, fill_colors, high_precision):
+    cases = []
+    for kind, (w, h), single_line, ignore_border, fill, hp in itertools.product(
+            kinds, sizes, (False, True), (False, True), fill_colors, high_precision):
+        if single_line and fill != 'none':
+            # 单线条模式输出开放笔画，不会填充，与 fill_color=none 结果相同
+            continue
+        case = {'kind': kind, 'width': w, 'height': h, 'single_line': single_line,
+                'ignore_border': ignore_border, 'fill_color': fill, 'high_precision': hp}
+        case['id'] = case_id(case)
+        cases.append(case)
+    return cases
+
+
+def _rss_bytes():
+    """当前常驻内存（仅 Linux），无法获取时返回 0"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def count_entities(dxf_bytes):
+    """统计 ENTITIES 段中各类实体的数量"""
+    lines = dxf_bytes.decode('utf-8', 'replace').splitlines()
+    counts = {}
+    in_entities = False
+    for code, value in zip(lines[0::2], lines[1::2]):
+        if code.strip() != '0' and not (code.strip() == '2' and value.strip() == 'ENTITIES'):
+            continue
+        value = value.strip()
+        if value == 'ENTITIES':
+            in_entities = True
+        elif value == 'ENDSEC':
+            if in_entities:
+                break
+        elif in_entities:
+            counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def parse_server_timing(header):
+    """把 Server-Timing 头解析为 {阶段: 秒}"""
+    stages = {}
+    for item in filter(None, (part.strip() for part in (header or '').split(','))):
+        name, _, dur = item.partition(';dur=')
+        if dur:
+            stages[name] = float(dur) / 1000
+    return stages
+
+
+def run_case(case, repeat, thinning='auto'):
+    """在独立子进程中执行一个用例：生成图片、调用 /convert_dxf，返回测量结果"""
+    import logging
+    logging.disable(logging.INFO)
+
+    rss_start = _rss_bytes()
+    import main
+    import pipeline
+    from metrics import peak_rss_bytes
+    from pipeline import stage_cache
+    pipeline.THINNING_BACKEND = thinning
+
+    png = make_png(case['kind'], case['width'], case['height'])
+    form = {
+        'threshold': '128',
+        'single_line': str(case['single_line']).lower(),
+        'ignore_border': str(case['ignore_border']).lower(),
+        'fill_color': case['fill_color'],
+        'high_precision': case['high_precision'],
+    }
+    client = main.app.test_client()
+    times = []
+    response = None
+    for _ in range(repeat):
+        # 每次都从上传开始，清空缓存避免后几次直接命中
+        main.image_store.clear()
+        main.source_store.clear()
+        stage_cache.clear()
+        data = dict(form, image=(io.BytesIO(png), 'bench.png'))
+        start = time.perf_counter()
+        response = client.post('/convert_dxf', data=data, content_type='multipart/form-data')
+        body = response.get_data()
+        times.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            return {'id': case['id'], 'error': f'{response.status_code}: {body[:200].decode("utf-8", "replace")}'}
+
+    entities = count_entities(body)
+    return {
+        'id': case['id'],
+        'case': {k: v for k, v in case.items() if k != 'id'},
+        'seconds': min(times),
+        'cold_seconds': times[0],
+        'peak_rss_bytes': peak_rss_bytes(),
+        'start_rss_bytes': rss_start,
+        'dxf_bytes': len(body),
+        'entities': sum(entities.values()),
+        'entity_types': entities,
+        'vertices_before': int(response.headers.get('X-Vertex-Count-Before', 0)),
+        'vertices_after': int(response.headers.get('X-Vertex-Count-After', 0)),
+        'stages': parse_server_timing(response.headers.get('Server-Timing')),
+    }
+
+
+def run_isolated(case, repeat, thinning='auto'):
+    """每个用例一个新进程（spawn），峰值内存互不影响，也不受前一用例缓存的干扰"""
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(run_case, (case, repeat, thinning))
+
+
+def run_micro(repeat):
+    """interpolate_points 与 smooth_curves 的微基准：输入为合成文字图的全部轮廓"""
+    import cv2
+    import logging
+    import numpy as np
+    logging.disable(logging.INFO)
+    from vectorize import interpolate_points, smooth_curves
+
+    img = make_drawing('glyphs', 2000, 1500)
+    _, binary = cv2.threshold(img, 128, 255, cv2.THRESH_BINARY_INV)
+    contours, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    polylines = [c.reshape(-1, 2).astype(np.float64) for c in contours if len(c) > 2]
+    total = sum(len(p) for p in polylines)
+
+    benches = {
+        'interpolate_points_x8': lambda: [interpolate_points(p, 8) for p in polylines],
+        'interpolate_points_x64': lambda: [interpolate_points(p, 64) for p in polylines],
+        'smooth_curve': lambda: smooth_curves([(p, True) for p in polylines]),
+    }
+    results = {}
+    for name, func in benches.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = func()
+            best = min(best, time.perf_counter() - start)
+        results[name] = {'seconds': best, 'contours': len(polylines), 'points_in': total,
+                         'points_out': sum(len(p) for p in out)}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基线对比，返回 (耗时回退列表, 输出变化列表)"""
+    regressions = []
+    changes = []
+    base_cases = {r['id']: r for r in baseline.get('results', []) if 'error' not in r}
+    for r in results['results']:
+        base = base_cases.get(r['id'])
+        if base is None or 'error' in r:
+            continue
+        delta = r['seconds'] - base['seconds']
+        if r['seconds'] > base['seconds'] * (1 + tolerance) and delta > MIN_DELTA:
+            regressions.append(f"{r['id']}: {base['seconds']:.3f}s -> {r['seconds']:.3f}s "
+                               f"(+{delta / base['seconds']:.0%})")
+        if r['entities'] != base['entities']:
+            changes.append(f"{r['id']}: 实体数 {base['entities']} -> {r['entities']}")
+    for name, r in results.get('micro', {}).items():
+        base = baseline.get('micro', {}).get(name)
+        if base is None:
+            continue
+        delta = r['seconds'] - base['seconds']
+        if r['seconds'] > base['seconds'] * (1 + tolerance) and delta > MIN_DELTA:
+            regressions.append(f"{name}: {base['seconds']:.3f}s -> {r['seconds']:.3f}s "
+                               f"(+{delta / base['seconds']:.0%})")
+    return regressions, changes
+
+
+def environment():
+    import cv2
+    import ezdxf
+    import numpy as np
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'ezdxf': ezdxf.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='只跑最小尺寸与部分精度模式')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--sizes', nargs='+', help='如 800x600 2000x1500')
+    parser.add_argument('--fill-colors', nargs='+', default=list(FILL_COLORS),
+                        choices=('none', 'black', 'white'))
+    parser.add_argument('--high-precision', nargs='+', choices=HIGH_PRECISION)
+    parser.add_argument('--filter', default='', help='只运行 id 包含该字符串的用例')
+    parser.add_argument('--repeat', type=int, default=3, help='每个用例重复次数，取最小耗时')
+    parser.add_argument('--thinning', default='auto',
+                        help='单线条模式的骨架化后端（auto/opencv/zhang_suen/guo_hall/skimage）')
+    parser.add_argument('--no-micro', action='store_true', help='跳过 interpolate_points/smooth_curves 微基准')
+    parser.add_argument('--output', help='结果 JSON 路径')
+    parser.add_argument('--baseline', help='对比的基线 JSON')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='允许的相对耗时增长，默认 0.15')
+    args = parser.parse_args()
+
+    if args.sizes:
+        sizes = [tuple(int(v) for v in s.lower().split('x')) for s in args.sizes]
+    else:
+        sizes = QUICK_SIZES if args.quick else SIZES
+    high_precision = args.high_precision or (QUICK_HIGH_PRECISION if args.quick else HIGH_PRECISION)
+    cases = [c for c in build_cases(args.kinds, sizes, args.fill_colors, high_precision)
+             if args.filter in c['id']]
+
+    results = {'meta': dict(environment(), args=vars(args)), 'results': []}
+    print(f"{len(cases)} 个用例，每个重复 {args.repeat} 次")
+    for i, case in enumerate(cases, 1):
+        r = run_isolated(case, args.repeat, args.thinning)
+        results['results'].append(r)
+        if 'error' in r:
+            print(f"[{i}/{len(cases)}] {case['id']}: 失败 {r['error']}")
+        else:
+            print(f"[{i}/{len(cases)}] {case['id']}: {r['seconds'] * 1000:.0f} ms, "
+                  f"峰值 {r['peak_rss_bytes'] / 2 ** 20:.0f} MB, "
+                  f"{r['entities']} 个实体, {r['dxf_bytes'] / 1024:.0f} KB")
+
+    if not args.no_micro:
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as pool:
+            results['micro'] = pool.apply(run_micro, (args.repeat,))
+        for name, r in results['micro'].items():
+            print(f"{name}: {r['seconds'] * 1000:.1f} ms ({r['points_in']} -> {r['points_out']} 点)")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {path}")
+
+    failed = sum('error' in r for r in results['results'])
+    if not args.baseline:
+        return 1 if failed else 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions, changes = compare(results, baseline, args.tolerance)
+    for line in changes:
+        print(f"输出变化 {line}")
+    for line in regressions:
+        print(f"性能回退 {line}")
+    if not regressions and not changes:
+        print(f"与基线 {args.baseline} 相比无回退（容差 {args.tolerance:.0%}）")
+    elif changes:
+        print("输出变化若是预期的，用 --save-baseline 更新基线")
+    return 1 if failed or regressions or changes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+骨架化后端的基准测试
+在同一组合成图纸上依次运行每个可用后端，记录首次调用（新进程，含导入开销）与
+重复调用的最小耗时、骨架像素数，并检查骨架是否为单像素宽、连通分量数是否与输入一致
+
+用法: python benchmarks/bench_thinning.py [--size 2000x1500] [--backends zhang_suen skimage]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_drawing
+
+
+def make_binary(kind, width, height):
+    """与 /convert_dxf 相同的二值化：阈值 128，黑色墨迹为前景"""
+    import cv2
+    _, binary = cv2.threshold(make_drawing(kind, width, height), 128, 255, cv2.THRESH_BINARY_INV)
+    return binary
+
+
+def count_thick_pixels(skeleton):
+    """2x2 全为前景的块数，单像素宽的骨架应为 0"""
+    fg = skeleton > 0
+    return int((fg[:-1, :-1] & fg[:-1, 1:] & fg[1:, :-1] & fg[1:, 1:]).sum())
+
+
+def run_backend(backend, kinds, width, height, repeat):
+    """在独立子进程中运行一个后端，第一次调用包含后端的导入与初始化开销"""
+    import cv2
+    import thinning
+
+    results = {}
+    for kind in kinds:
+        binary = make_binary(kind, width, height)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            skeleton = thinning.thin(binary, backend)
+            times.append(time.perf_counter() - start)
+        results[kind] = {
+            'cold_seconds': times[0],
+            'seconds': min(times),
+            'pixels': int((skeleton > 0).sum()),
+            'thick': count_thick_pixels(skeleton),
+            'components': cv2.connectedComponents(skeleton, connectivity=8)[0] - 1,
+            'input_components': cv2.connectedComponents(binary, connectivity=8)[0] - 1,
+        }
+    return results
+
+
+def main():
+    import thinning
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='2000x1500', help='图纸尺寸，如 2000x1500')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--backends', nargs='+', choices=list(thinning.BACKENDS),
+                        default=thinning.available_backends())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    ctx = multiprocessing.get_context('spawn')
+    print(f"尺寸 {width}x{height}，每个后端重复 {args.repeat} 次")
+    for backend in args.backends:
+        with ctx.Pool(1) as pool:
+            results = pool.apply(run_backend, (backend, args.kinds, width, height, args.repeat))
+        for kind, r in results.items():
+            print(f"{backend:>10} {kind:>10}: {r['seconds'] * 1000:7.1f} ms "
+                  f"(首次 {r['cold_seconds'] * 1000:7.1f} ms)，骨架 {r['pixels']} 像素，"
+                  f"2x2 块 {r['thick']}，连通分量 {r['components']}/{r['input_components']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+阈值扫描的基准测试
+对比一次 /threshold_sweep（直方图 + LUT 二值化统计轮廓数）与逐个阈值请求完整预览的服务器端耗时，
+并校验扫描得到的前景像素数、轮廓数与完整流水线的结果一致
+
+用法: python benchmarks/bench_threshold_sweep.py [--size 2000x1500] [--step 8]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_png
+
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    import cv2
+    import numpy as np
+    import main as app_module
+    from pipeline import BORDER_SIZE, preprocess, stage_cache
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='2000x1500', help='图纸尺寸，如 2000x1500')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--step', type=int, default=8)
+    parser.add_argument('--invert', action='store_true')
+    parser.add_argument('--ignore-border', action='store_true')
+    parser.add_argument('--preview-width', type=int, default=1200, help='预览请求的显示宽度')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    form = {'invert': str(args.invert).lower(), 'ignore_border': str(args.ignore_border).lower()}
+    client = app_module.app.test_client()
+    print(f"尺寸 {width}x{height}，间隔 {args.step}，invert={args.invert}，ignore_border={args.ignore_border}")
+    for kind in args.kinds:
+        upload = client.post('/upload_image', data={'image': (io.BytesIO(make_png(kind, width, height)), 'a.png')},
+                             content_type='multipart/form-data').get_json()
+        image_id = upload['image_id']
+        img = app_module.image_store.get(image_id)
+
+        stage_cache.clear()
+        start = time.perf_counter()
+        sweep = client.post('/threshold_sweep', data={'image_id': image_id, 'step': args.step, **form}).get_json()
+        sweep_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        client.post('/threshold_sweep', data={'image_id': image_id, 'step': args.step, **form})
+        cached_seconds = time.perf_counter() - start
+
+        # 旧方式：逐个阈值请求完整预览
+        stage_cache.clear()
+        start = time.perf_counter()
+        for threshold in sweep['thresholds']:
+            client.post('/process_preview', data={'image_id': image_id, 'threshold': threshold,
+                                                  'max_width': args.preview_width, **form})
+        preview_seconds = time.perf_counter() - start
+
+        # 校验：扫描结果与完整流水线二值化后统计的前景像素数、轮廓数一致
+        matches = True
+        for i, threshold in enumerate(sweep['thresholds']):
+            binary = preprocess(image_id, img, threshold, args.invert, args.ignore_border, False)
+            contours, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+            # 前景像素数不含加上的边框
+            inner = binary[BORDER_SIZE:-BORDER_SIZE, BORDER_SIZE:-BORDER_SIZE] if args.ignore_border else binary
+            matches &= len(contours) == sweep['contours'][i] and np.count_nonzero(inner) == sweep['foreground'][i]
+
+        points = len(sweep['thresholds'])
+        print(f"{kind:>10}: {points} 个阈值，扫描 {sweep_seconds * 1000:7.1f} ms（缓存后 {cached_seconds * 1000:.1f} ms），"
+              f"逐个预览 {preview_seconds * 1000:7.1f} ms，Otsu {sweep['otsu']}，三角法 {sweep['triangle']}，"
+              f"结果一致: {matches}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+轮廓转换与插值的基准测试
+对比逐点 Python 循环（旧实现）与 NumPy 向量化实现的耗时，并校验输出一致
+
+用法: python benchmarks/bench_vectorize.py [--points 50000] [--factor 64]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorize import interpolate_points
+
+
+def reference_contour_to_points(contour):
+    """旧实现：逐点构建元组列表"""
+    points = []
+    for point in contour:
+        x, y = point[0]
+        points.append((float(x), float(y)))
+    return points
+
+
+def reference_interpolate_points(points, factor):
+    """旧实现：每条边逐个追加 factor-1 个元组"""
+    new_points = []
+    for i in range(len(points)):
+        new_points.append(points[i])
+        next_i = (i + 1) % len(points)
+        x1, y1 = points[i]
+        x2, y2 = points[next_i]
+        for j in range(1, factor):
+            t = j / factor
+            new_points.append((x1 + (x2 - x1) * t, y1 + (y2 - y1) * t))
+    return new_points
+
+
+def make_contours(total_points, points_per_contour=500, seed=0):
+    """生成与 cv2.findContours 输出同形状 (N, 1, 2) int32 的随机轮廓"""
+    rng = np.random.default_rng(seed)
+    contours = []
+    remaining = total_points
+    while remaining > 0:
+        n = min(points_per_contour, remaining)
+        contours.append(rng.integers(0, 2000, size=(n, 1, 2), dtype=np.int32))
+        remaining -= n
+    return contours
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--points', type=int, default=50000, help='轮廓总点数')
+    parser.add_argument('--factor', type=int, default=64, help='插值倍数')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    contours = make_contours(args.points)
+
+    def run_reference():
+        return [reference_interpolate_points(reference_contour_to_points(c), args.factor) for c in contours]
+
+    def run_vectorized():
+        return [interpolate_points(c.reshape(-1, 2).astype(np.float64), args.factor) for c in contours]
+
+    ref_time, ref_result = timed(run_reference, args.repeat)
+    vec_time, vec_result = timed(run_vectorized, args.repeat)
+
+    identical = all(np.array_equal(np.asarray(r), v) for r, v in zip(ref_result, vec_result))
+    total_out = sum(len(v) for v in vec_result)
+
+    print(f"轮廓数: {len(contours)}，总点数: {args.points}，倍数: {args.factor}，输出点数: {total_out}")
+    print(f"Python 循环: {ref_time * 1000:.1f} ms")
+    print(f"NumPy 向量化: {vec_time * 1000:.1f} ms")
+    print(f"加速比: {ref_time / vec_time:.1f}x，输出一致: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+曲线输出的往返校验
+以 curve_output=spline/arc 转换合成图纸，写出 ASCII DXF 后用 ezdxf 读回，把每个 SPLINE、带凸度的
+LWPOLYLINE 和 HATCH 边界经 ezdxf.path 展平，与同一轮廓拟合的样条（按 1/100 容差密集采样）比较：
+两者之间双向的最大距离都应不超过 curve_tolerance（圆弧为两倍容差）
+
+用法: python benchmarks/check_curve_output.py [--size 1000x750] [--tolerance 0.1]
+"""
+
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import KINDS, make_png
+
+# 比较前把折线加密到的最大段长（相对容差），距离的高估不超过其一半
+DENSIFY_STEP = 1 / 20
+
+
+def densify(polyline, step):
+    """在每段上等距插入点，使段长不超过 step"""
+    seg = np.diff(polyline, axis=0)
+    k = np.maximum(np.ceil(np.hypot(seg[:, 0], seg[:, 1]) / step).astype(np.int64), 1)
+    index = np.repeat(np.arange(len(seg)), k)
+    t = (np.arange(k.sum()) - np.repeat(np.cumsum(k) - k, k)) / k[index]
+    return np.vstack([polyline[index] + t[:, None] * seg[index], polyline[-1:]])
+
+
+def max_distance(source, target, step):
+    """source 折线上各处到 target 折线的最近距离的最大值"""
+    from scipy.spatial import cKDTree
+    distances, _ = cKDTree(densify(target, step)).query(densify(source, step))
+    return float(distances.max())
+
+
+def flatten(path, tolerance):
+    return np.array([(v.x, v.y) for v in path.flattening(tolerance / 10)], dtype=np.float64)
+
+
+def check(kind, img, params, tolerance):
+    """返回 (校验的曲线数, 最大偏差)"""
+    import ezdxf
+    from ezdxf import path as ezpath
+    from output_formats import write_document
+    from splines import smooth_polylines
+    from vectorize import _trace_level, convert, hatch_groups
+
+    level = _trace_level(kind, img, params, params['threshold'])
+    shapes, kinds, polylines = level['shapes'], level['kinds'], level['polylines']
+    reference = smooth_polylines(polylines, tolerance / 100)
+    for i, (_, closed) in enumerate(polylines):
+        if closed:
+            reference[i] = np.vstack([reference[i], reference[i][:1]])
+
+    doc, _ = convert(kind, img, params)
+    buffer = io.BytesIO()
+    write_document(doc, buffer, 'dxf')
+    msp = ezdxf.read(io.StringIO(buffer.getvalue().decode(doc.output_encoding))).modelspace()
+
+    # 读回的实体顺序与写入一致：先各 HATCH（外边界 + 孔洞），后逐条曲线
+    expected = []
+    if level['hierarchy'] is not None:
+        expected += [[outer] + holes for outer, holes in hatch_groups(shapes, level['hierarchy'])]
+    expected += [[i] for i, points in enumerate(shapes) if points is not None]
+    entities = list(msp)
+    assert len(entities) == len(expected), (len(entities), len(expected))
+
+    checked = 0
+    worst = 0.0
+    for entity, indices in zip(entities, expected):
+        sub_paths = list(ezpath.make_path(entity).sub_paths())
+        assert len(sub_paths) == len(indices), (entity.dxftype(), len(sub_paths), len(indices))
+        for sub_path, i in zip(sub_paths, indices):
+            if kinds[i] == 'polyline':
+                continue
+            curve = flatten(sub_path, tolerance)
+            step = tolerance * DENSIFY_STEP
+            worst = max(worst, max_distance(reference[i], curve, step), max_distance(curve, reference[i], step))
+            checked += 1
+    return checked, worst
+
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    from pipeline import decode_image
+    from vectorize import parse_convert_params
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='1000x750', help='图纸尺寸，如 1000x750')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--tolerance', type=float, default=0.1, help='curve_tolerance（像素）')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    cases = [('spline', 'none', False), ('spline', 'black', False), ('spline', 'none', True),
+             ('arc', 'none', False), ('arc', 'black', False), ('arc', 'none', True)]
+    failed = False
+    for kind in args.kinds:
+        img = decode_image(make_png(kind, width, height))
+        for curve_output, fill_color, single_line in cases:
+            params = parse_convert_params({
+                'high_precision': 'curve_edge',
+                'curve_output': curve_output,
+                'curve_tolerance': str(args.tolerance),
+                'fill_color': fill_color,
+                'single_line': str(single_line).lower(),
+            })
+            checked, worst = check(kind, img, params, args.tolerance)
+            # 圆弧相对样条的偏差不超过两倍容差（采样与合并各一份）；另加参考曲线与加密的误差
+            limit = args.tolerance * ((2 if curve_output == 'arc' else 1) + 0.01 + DENSIFY_STEP / 2)
+            ok = worst <= limit
+            failed |= not ok
+            print(f"{kind:>10} {curve_output:>6} fill={fill_color:<5} single_line={single_line!s:<5}: "
+                  f"{checked:5d} 条曲线，最大偏差 {worst:.4f} px（上限 {limit:.3f}）{'通过' if ok else '失败'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+基准测试用的合成图纸
+按固定随机种子离线生成线稿、填充图形、文字和带噪扫描件，保证每次运行输入完全一致
+"""
+
+import zlib
+
+import numpy as np
+import cv2
+
+KINDS = ('line_art', 'filled', 'glyphs', 'noisy_scan')
+
+
+def _rng(kind, width, height, seed):
+    # 用 crc32 而不是 hash()，后者在不同进程间随机化
+    return np.random.default_rng([zlib.crc32(kind.encode()), width, height, seed])
+
+
+def _density(width, height):
+    """返回 (线性比例, 数量比例)
+
+    同一张图纸以不同分辨率扫描：图形尺寸与线宽随分辨率线性缩放，图形数量只随宽高比变化，
+    因此各尺寸下的墨迹占比大致相同。
+    """
+    longest = max(width, height)
+    return longest / 1000, width * height / longest ** 2
+
+
+def _line_art(rng, width, height):
+    """白底黑线：局部折线、圆、矩形，线宽 1-4 像素（按分辨率缩放）"""
+    img = np.full((height, width), 255, np.uint8)
+    scale, amount = _density(width, height)
+    for _ in range(int(60 * amount)):
+        n = int(rng.integers(2, 7))
+        start = rng.integers(0, (width, height))
+        steps = rng.integers(-150, 151, size=(n - 1, 2)) * scale
+        pts = np.vstack([start, start + np.cumsum(steps, axis=0)]).astype(np.int32)
+        thickness = max(1, int(rng.integers(1, 5) * scale))
+        cv2.polylines(img, [pts], bool(rng.integers(0, 2)), 0, thickness, cv2.LINE_AA)
+    for _ in range(int(30 * amount)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        thickness = max(1, int(rng.integers(1, 4) * scale))
+        cv2.circle(img, center, int(rng.integers(10, 80) * scale), 0, thickness, cv2.LINE_AA)
+    for _ in range(int(20 * amount)):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(20, 200) * scale), int(rng.integers(20, 200) * scale)
+        cv2.rectangle(img, (x, y), (x + w, y + h), 0, max(1, int(rng.integers(1, 3) * scale)))
+    return img
+
+
+def _filled(rng, width, height):
+    """实心多边形与椭圆，部分带孔洞，用于填充模式"""
+    img = np.full((height, width), 255, np.uint8)
+    scale, amount = _density(width, height)
+    for _ in range(int(40 * amount)):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        r = rng.integers(15, 80) * scale
+        n = int(rng.integers(3, 12))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+        radii = r * rng.uniform(0.5, 1.0, n)
+        pts = np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)]).astype(np.int32)
+        cv2.fillPoly(img, [pts], 0, cv2.LINE_AA)
+        if rng.random() < 0.5:
+            cv2.circle(img, (cx, cy), int(r * 0.3), 255, -1, cv2.LINE_AA)
+    for _ in range(int(25 * amount)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(10, 60) * scale), int(rng.integers(10, 60) * scale))
+        cv2.ellipse(img, center, axes, float(rng.uniform(0, 180)), 0, 360, 0, -1, cv2.LINE_AA)
+    return img
+
+
+def _glyphs(rng, width, height):
+    """类文字图形：多种 Hershey 字体的随机字符串，轮廓多且细碎"""
+    img = np.full((height, width), 255, np.uint8)
+    fonts = (cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_COMPLEX, cv2.FONT_HERSHEY_TRIPLEX,
+             cv2.FONT_HERSHEY_SCRIPT_SIMPLEX)
+    alphabet = np.array(list('ABCDEFGHJKLMNPQRSTUVWXYZabdeghkmnpqrstuwxyz0123456789'))
+    scale, _ = _density(width, height)
+    line_height = int(40 * scale)
+    for y in range(line_height, height - 10, line_height):
+        x = int(rng.integers(5, 40))
+        while x < width - 50:
+            word = ''.join(rng.choice(alphabet, int(rng.integers(2, 9))))
+            font = fonts[int(rng.integers(0, len(fonts)))]
+            font_scale = float(rng.uniform(0.6, 1.2)) * scale
+            thickness = max(1, int(rng.integers(1, 4) * scale))
+            (w, _), _ = cv2.getTextSize(word, font, font_scale, thickness)
+            cv2.putText(img, word, (x, y), font, font_scale, 0, thickness, cv2.LINE_AA)
+            x += w + int(20 * scale)
+    return img
+
+
+def _noisy_scan(rng, width, height):
+    """模拟扫描件：线稿 + 不均匀光照 + 模糊 + 高斯噪声 + 椒盐噪声"""
+    img = _line_art(rng, width, height).astype(np.float32)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    img -= 40 * (xx / width) + 25 * (yy / height)
+    img = cv2.GaussianBlur(img, (0, 0), 1.2)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    salt = rng.random(img.shape) < 0.002
+    pepper = rng.random(img.shape) < 0.002
+    img[salt] = 255
+    img[pepper] = 0
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+_GENERATORS = {
+    'line_art': _line_art,
+    'filled': _filled,
+    'glyphs': _glyphs,
+    'noisy_scan': _noisy_scan,
+}
+
+
+def make_drawing(kind, width, height, seed=0):
+    """生成灰度合成图纸 (height, width) uint8"""
+    return _GENERATORS[kind](_rng(kind, width, height, seed), width, height)
+
+
+def make_png(kind, width, height, seed=0):
+    """生成合成图纸并编码为 PNG 字节（作为上传文件）"""
+    ok, buffer = cv2.imencode('.png', make_drawing(kind, width, height, seed))
+    return buffer.tobytes()
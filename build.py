@@ -8,6 +8,8 @@ import sys
 import subprocess
 import shutil
 
+from startup import DEFERRED_MODULES
+
 def clean_build_files():
     """清理之前的打包文件"""
     paths_to_remove = ['build', 'dist']
@@ -27,8 +29,11 @@ def build_exe():
         '--clean',
         '--noconfirm',
         '--add-data', 'templates;templates',
-        'main.py'
     ]
+    # 推迟导入的模块经由 importlib 加载，PyInstaller 无法静态发现
+    for module in DEFERRED_MODULES:
+        cmd += ['--hidden-import', module]
+    cmd.append('main.py')
     
     try:
         result = subprocess.run(cmd, shell=True, capture_output=True, text=True, encoding='utf-8')
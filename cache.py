@@ -0,0 +1,114 @@
+"""
+内存缓存工具
+按字节预算和过期时间淘汰的线程安全 LRU 缓存
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def estimate_size(value):
+    """估算缓存值占用的字节数"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(v) for v in value) + 64
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + 64
+    return 64
+
+
+class LRUCache:
+    """按字节预算和 TTL 淘汰的 LRU 缓存"""
+
+    def __init__(self, max_bytes, ttl=None, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def __contains__(self, key):
+        return self.get(key, touch=False) is not None
+
+    def get(self, key, default=None, touch=True):
+        """读取缓存值，命中时刷新 LRU 顺序"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            if touch:
+                self._items.move_to_end(key)
+                if self.ttl is not None:
+                    self._items[key] = (value, size, time.monotonic() + self.ttl)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """写入缓存值，超出预算时淘汰最久未使用的条目"""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            # 单个值超过整体预算，不缓存
+            return False
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (value, size, expires_at)
+            self.current_bytes += size
+            self._evict()
+        return True
+
+    def get_or_create(self, key, factory):
+        """命中则返回缓存值，否则调用 factory 计算并写入"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._items.pop(key)
+        self.current_bytes -= size
+
+    def _evict(self):
+        now = time.monotonic()
+        # 先清理过期条目
+        expired = [k for k, (_, _, exp) in self._items.items() if exp is not None and exp < now]
+        for key in expired:
+            self._remove(key)
+        # 再按 LRU 顺序淘汰直到满足预算
+        while self.current_bytes > self.max_bytes and self._items:
+            oldest = next(iter(self._items))
+            self._remove(oldest)
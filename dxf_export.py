@@ -0,0 +1,76 @@
+"""
+DXF 输出
+把 ezdxf 文档按所选格式序列化到溢出式临时文件并以分块方式返回，
+避免 StringIO → bytes → BytesIO 的多份完整拷贝
+"""
+
+import os
+import tempfile
+
+from flask import current_app, send_file
+
+from metrics import count, timed
+from output_formats import output_filename, output_mimetype, write_document
+
+# 输出小于该值时保存在内存中，超过后自动转存到磁盘临时文件
+DXF_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+def write_dxf_spooled(doc, fmt='dxf'):
+    """把文档编码写入溢出式临时文件，返回 (文件对象, 字节数)，文件指针已回到开头"""
+    spool = tempfile.SpooledTemporaryFile(max_size=DXF_SPOOL_MAX_SIZE, mode='w+b')
+    try:
+        with timed('dxf_serialize'):
+            write_document(doc, spool, fmt)
+    except Exception:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
+    count('dxf_bytes', size)
+    return spool, size
+
+
+def dxf_response(doc, fmt='dxf', download_name='opencv_vector'):
+    """序列化文档并以分块流式响应返回，响应结束时临时文件自动删除
+
+    download_name 不含扩展名，扩展名与 MIME 类型由输出格式决定。
+    """
+    spool, size = write_dxf_spooled(doc, fmt)
+    response = send_file(
+        spool,
+        as_attachment=True,
+        download_name=output_filename(download_name, fmt),
+        mimetype=output_mimetype(fmt)
+    )
+    response.content_length = size
+    return response
+
+
+def write_dxf_file(doc, path, fmt='dxf'):
+    """把文档编码写入磁盘文件，返回字节数"""
+    with timed('dxf_serialize'), open(path, 'wb') as f:
+        write_document(doc, f, fmt)
+    size = os.path.getsize(path)
+    count('dxf_bytes', size)
+    return size
+
+
+def file_response(file, fmt='dxf', download_name='opencv_vector', etag=None):
+    """以已打开的磁盘文件作为下载响应，响应结束时关闭文件
+
+    生产服务器对磁盘文件使用 sendfile 发送；开启 USE_X_SENDFILE 时改为只返回路径，由前端服务器发送。
+    """
+    if current_app.config['USE_X_SENDFILE']:
+        file.close()
+        file = file.name
+    response = send_file(
+        file,
+        as_attachment=True,
+        download_name=output_filename(download_name, fmt),
+        mimetype=output_mimetype(fmt),
+        etag=etag or False
+    )
+    if not isinstance(file, str):
+        response.content_length = os.fstat(file.fileno()).st_size
+    return response
@@ -0,0 +1,128 @@
+"""
+直接输出 DXF 组码的轻量文档
+只含 LWPOLYLINE 与实体填充 HATCH 的图纸（矢量化的绝大多数输出）不经过 ezdxf 的实体对象模型：
+几何数据保持为 NumPy 数组，写入时直接按组码格式化。表、块、对象等其余部分取自同配置的空
+ezdxf 文档，ENTITIES 段之外的内容与 ezdxf 的输出完全相同，实体的组码顺序与 ezdxf 一致
+"""
+
+import io
+
+import numpy as np
+
+from startup import load
+
+# 空文档中 ENTITIES 段的内容，实体插入在两者之间
+_ENTITIES_BEGIN = '  0\nSECTION\n  2\nENTITIES\n'
+_ENTITIES_END = '  0\nENDSEC\n'
+
+_VERTEX = ' 10\n%r\n 20\n%r\n'
+_BULGE_VERTEX = ' 10\n%r\n 20\n%r\n 42\n%r\n'
+
+
+def _vertices(points):
+    """(N, 2) 顶点 → 10/20 组码"""
+    return (_VERTEX * len(points)) % tuple(np.asarray(points, dtype=np.float64).ravel().tolist())
+
+
+def _bulge_vertices(xyb, always):
+    """(N, 3) 顶点 → 10/20/42 组码；always 为 False 时与 LWPOLYLINE 一致，凸度为 0 的顶点省略 42"""
+    rows = np.asarray(xyb, dtype=np.float64).tolist()
+    if always:
+        return (_BULGE_VERTEX * len(rows)) % tuple(v for row in rows for v in row)
+    return ''.join(_BULGE_VERTEX % (x, y, b) if b else _VERTEX % (x, y) for x, y, b in rows)
+
+
+def _has_bulges(points):
+    return points.shape[1] == 3 and bool(points[:, 2].any())
+
+
+class PolylineDocument:
+    """LWPOLYLINE/HATCH 文档，接口与写入方式与 ezdxf 文档的 write 兼容
+
+    width/height 为图纸范围（图像尺寸），写入 $EXTMIN/$EXTMAX。layer 为默认图层，
+    其他图层用 add_layer 添加，必须在添加实体之前、按与 ezdxf 文档相同的顺序创建。
+    顶点数组只保存引用，写入时逐个实体格式化，不生成中间对象。
+    """
+
+    def __init__(self, width, height, layer='0', layer_color=7):
+        ezdxf = load('ezdxf')
+        self._doc = ezdxf.new('R2000')
+        if layer != '0':
+            self._doc.layers.new(layer, dxfattribs={'color': layer_color})
+        msp = self._doc.modelspace()
+        msp.dxf.extmin = self._doc.header['$EXTMIN'] = (0, 0, 0)
+        msp.dxf.extmax = self._doc.header['$EXTMAX'] = (width, height, 0)
+        self.layer = layer
+        self.output_encoding = self._doc.output_encoding
+        # (类型, 图层, 数据)：('HATCH', 图层, (颜色, [(顶点, 边界标志)])) 或 ('LWPOLYLINE', 图层, (顶点, 闭合))
+        self._entities = []
+        self._template = None
+
+    def __len__(self):
+        return len(self._entities)
+
+    def add_layer(self, name, color=7):
+        """添加图层（ACI 颜色）"""
+        self._doc.layers.new(name, dxfattribs={'color': color})
+        self._template = None
+
+    def add_lwpolyline(self, points, closed, layer=None):
+        """points 为 (N, 2) 或带凸度的 (N, 3) 数组；layer 默认为文档的默认图层"""
+        self._entities.append(('LWPOLYLINE', layer or self.layer, (np.asarray(points), closed)))
+        self._template = None
+
+    def add_hatch(self, color, boundaries, layer=None):
+        """实体填充；boundaries 为 [(顶点, 边界标志)]，标志同 ezdxf 的 BOUNDARY_PATH_*"""
+        boundaries = [(np.asarray(p), flags) for p, flags in boundaries]
+        self._entities.append(('HATCH', layer or self.layer, (color, boundaries)))
+        self._template = None
+
+    def _render_template(self):
+        """写出空文档并在 ENTITIES 段处切开，实体句柄从预留的区间中分配"""
+        handles = self._doc.entitydb.handles
+        first = int(str(handles), 16)
+        # 预留实体句柄，ezdxf 写入时分配的句柄与 $HANDSEED 都排在其后
+        handles.reset('%X' % (first + len(self._entities)))
+        stream = io.StringIO()
+        self._doc.write(stream)
+        text = stream.getvalue()
+        begin = text.index(_ENTITIES_BEGIN) + len(_ENTITIES_BEGIN)
+        end = text.index(_ENTITIES_END, begin)
+        owner = self._doc.modelspace().block_record_handle
+        return text[:begin], text[end:], first, owner
+
+    def _hatch_tags(self, handle, owner, layer, color, boundaries):
+        parts = [f'  0\nHATCH\n  5\n{handle}\n330\n{owner}\n100\nAcDbEntity\n  8\n{layer}\n'
+                 f' 62\n{color}\n100\nAcDbHatch\n 10\n0.0\n 20\n0.0\n 30\n0.0\n'
+                 f'210\n0.0\n220\n0.0\n230\n1.0\n  2\nSOLID\n 70\n1\n 71\n0\n 91\n{len(boundaries)}\n']
+        for points, flags in boundaries:
+            # 多段线边界（标志位 2），有凸度时每个顶点都写 42
+            bulged = _has_bulges(points)
+            parts.append(f' 92\n{flags | 2}\n 72\n{int(bulged)}\n 73\n1\n 93\n{len(points)}\n')
+            parts.append(_bulge_vertices(points, True) if bulged else _vertices(points[:, :2]))
+            parts.append(' 97\n0\n')
+        parts.append(' 75\n0\n 76\n1\n 98\n0\n')
+        return ''.join(parts)
+
+    def _lwpolyline_tags(self, handle, owner, layer, points, closed):
+        header = (f'  0\nLWPOLYLINE\n  5\n{handle}\n330\n{owner}\n100\nAcDbEntity\n  8\n{layer}\n'
+                  f'100\nAcDbPolyline\n 90\n{len(points)}\n 70\n{int(closed)}\n')
+        if _has_bulges(points):
+            return header + _bulge_vertices(points, False)
+        return header + _vertices(points[:, :2])
+
+    def write(self, stream, fmt='asc'):
+        """按 ezdxf Drawing.write 的约定写入文本流，只支持 ASCII DXF"""
+        if fmt != 'asc':
+            raise ValueError(f"PolylineDocument 只支持 ASCII DXF，不支持 {fmt}")
+        if self._template is None:
+            self._template = self._render_template()
+        prefix, suffix, first, owner = self._template
+        stream.write(prefix)
+        for i, (dxftype, layer, data) in enumerate(self._entities):
+            handle = '%X' % (first + i)
+            if dxftype == 'HATCH':
+                stream.write(self._hatch_tags(handle, owner, layer, *data))
+            else:
+                stream.write(self._lwpolyline_tags(handle, owner, layer, *data))
+        stream.write(suffix)
@@ -0,0 +1,225 @@
+"""
+异步任务
+CPU 密集的转换在进程池中执行，HTTP 线程只负责提交、查询进度、取消和取回结果。
+进度与取消标记保存在 multiprocessing.Manager 的共享字典中
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# 默认工作进程数
+JOB_WORKERS = os.cpu_count() or 2
+# 任务结束后结果保留的时间（秒）
+JOB_RESULT_TTL = 30 * 60
+# 工作进程上报进度的最小间隔（秒），每次上报都是一次进程间通信
+PROGRESS_INTERVAL = 0.2
+# 工作进程的启动方式：进程池在多线程的服务器中按需创建，fork 出的子进程可能继承其他请求线程
+# 正持有的锁（阶段缓存、指标、准入控制）而死锁，因此与 Windows 一致使用 spawn
+JOB_START_METHOD = 'spawn'
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+# 工作进程内的共享状态，由 _init_worker 设置
+_worker_progress = None
+_worker_cancelled = None
+
+
+def _init_worker(progress, cancelled):
+    global _worker_progress, _worker_cancelled
+    _worker_progress = progress
+    _worker_cancelled = cancelled
+
+
+class _Reporter:
+    """工作进程内的进度回调：节流上报进度，并在取消时抛出 JobCancelled"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last = None
+
+    def __call__(self, stage, fraction):
+        now = time.monotonic()
+        if self._last is not None and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        if _worker_cancelled.get(self.job_id):
+            raise JobCancelled(self.job_id)
+        _worker_progress[self.job_id] = (stage, fraction)
+
+
+def _run_job(job_id, func, args):
+    """在工作进程中执行任务函数，func 需接受 progress 关键字参数"""
+    reporter = _Reporter(job_id)
+    if _worker_cancelled.get(job_id):
+        raise JobCancelled(job_id)
+    _worker_progress[job_id] = ('开始', 0.0)
+    return func(*args, progress=reporter)
+
+
+class Job:
+    """一个转换任务的状态"""
+
+    def __init__(self, job_id, files=()):
+        self.id = job_id
+        # queued / running / done / error / cancelled
+        self.state = 'queued'
+        self.message = ''
+        self.result = None
+        self.files = list(files)
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'error', 'cancelled')
+
+
+class JobManager:
+    """基于进程池的任务队列，工作进程在第一次提交时才启动"""
+
+    def __init__(self, max_workers=JOB_WORKERS, ttl=JOB_RESULT_TTL, on_finished=None):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        # 任务结束（完成、失败或取消）后在主进程中调用 on_finished(job)
+        self.on_finished = on_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._manager = None
+        self._executor = None
+        self._progress = None
+        self._cancelled = None
+
+    def _ensure_executor(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context(JOB_START_METHOD).Manager()
+            self._progress = self._manager.dict()
+            self._cancelled = self._manager.dict()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(JOB_START_METHOD),
+                initializer=_init_worker,
+                initargs=(self._progress, self._cancelled),
+            )
+        return self._executor
+
+    def submit(self, job_id, func, args, files=()):
+        """提交任务；files 为任务产生的文件，任务过期或取消时删除"""
+        job = Job(job_id, files)
+        with self._lock:
+            self._expire()
+            executor = self._ensure_executor()
+            self._jobs[job_id] = job
+            job.future = executor.submit(_run_job, job_id, func, args)
+        job.future.add_done_callback(lambda future: self._on_done(job, future))
+        return job
+
+    def add_done(self, job_id, result, files=()):
+        """登记已有结果的任务（如结果缓存命中），不经过进程池，也不调用 on_finished"""
+        job = Job(job_id, files)
+        job.state = 'done'
+        job.result = result
+        job.finished_at = time.time()
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = job
+        return job
+
+    def _on_done(self, job, future):
+        with self._lock:
+            if future.cancelled():
+                job.state = 'cancelled'
+            else:
+                exc = future.exception()
+                if exc is None:
+                    job.state = 'done'
+                    job.result = future.result()
+                elif isinstance(exc, JobCancelled):
+                    job.state = 'cancelled'
+                else:
+                    job.state = 'error'
+                    job.message = str(exc) or exc.__class__.__name__
+                    if isinstance(exc, BrokenProcessPool):
+                        # 工作进程异常退出，下次提交时重建进程池
+                        self._executor = None
+            job.finished_at = time.time()
+            self._progress.pop(job.id, None)
+            self._cancelled.pop(job.id, None)
+            # 失败、取消或已被 discard 的任务不保留结果文件
+            if job.state != 'done' or self._jobs.get(job.id) is not job:
+                self._remove_files(job)
+        if self.on_finished is not None:
+            self.on_finished(job)
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def status(self, job):
+        """返回任务状态字典：state、stage、progress、message"""
+        stage, fraction = '', 0.0
+        if job.state == 'done':
+            stage, fraction = '完成', 1.0
+        elif not job.finished and self._progress is not None:
+            reported = self._progress.get(job.id)
+            if reported is not None:
+                job.state = 'running'
+                stage, fraction = reported
+        return {
+            'job_id': job.id,
+            'state': job.state,
+            'stage': stage,
+            'progress': round(fraction, 3),
+            'message': job.message,
+        }
+
+    def cancel(self, job_id):
+        """取消任务：排队中的直接撤销，运行中的在下一次上报进度时中止"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if not job.future.cancel():
+            self._cancelled[job_id] = True
+        return job
+
+    def discard(self, job_id):
+        """移除任务及其文件；未结束的任务先取消"""
+        job = self.cancel(job_id)
+        if job is None:
+            return
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            if job.finished:
+                self._remove_files(job)
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            self._remove_files(self._jobs.pop(job_id))
+
+    @staticmethod
+    def _remove_files(job):
+        for path in job.files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
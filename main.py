@@ -1,92 +1,247 @@
 import os
 import gc
 import base64
-import io
-import numpy as np
+import hashlib
+import logging
+import multiprocessing
+import time
+import uuid
+
+import startup
+# 核心依赖先经由 startup 导入，记录各模块的导入耗时
+startup.load_all(startup.CORE_MODULES)
+
 import cv2
-import ezdxf
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
+
+from admission import AdmissionController, Overloaded, estimate_cost
+from batch import admit_first, iter_uploaded_images, stream_batch_zip
+from cache import LRUCache
+from dxf_export import dxf_response, file_response, write_dxf_file
+import metrics
+from jobs import JobManager
+from output_formats import output_filename, output_mimetype
+from pipeline import decimate, decode_image, preprocess, source_pixels, stage_cache
+from preview import (FAST_PREVIEW_WIDTH, PREVIEW_FORMATS, PreviewSuperseded, PreviewTracker,
+                     encode_preview)
+from result_cache import RESULT_CACHE_MAX_BYTES, ResultCache, result_key
+import serving
+from thresholds import SWEEP_STEP, threshold_sweep
+from vectorize import convert, convert_to_file, parse_convert_params
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
 # 配置
 UPLOAD_FOLDER = 'temp'
-MAX_WIDTH = 2000 
+# 已上传图片会话：解码并缩放后的图像按内容哈希缓存
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+IMAGE_CACHE_TTL = 30 * 60
+# 全分辨率（分块）矢量化需要原始文件，按同一哈希保存压缩后的上传字节
+SOURCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 响应中附带各阶段耗时的 Server-Timing 头（浏览器开发者工具可直接查看）
+SERVER_TIMING = True
+LOG_LEVEL = logging.INFO
+# 启动策略：warm 在接受请求前导入全部依赖并预热一次转换，lazy 推迟导入以最快启动
+STARTUP_MODE = 'warm'
+# 服务模式：production 使用固定线程池并按内存预算准入，development 为 Flask 调试服务器
+SERVE_MODE = 'production'
+# 上传大小上限（字节），按 Content-Length 在读取请求体之前检查；批量接口单独设置
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+BATCH_MAX_UPLOAD_BYTES = 1024 * 1024 * 1024
+# 异步任务的 DXF 结果目录（工作进程与 send_file 都使用绝对路径）
+JOB_FOLDER = os.path.abspath(os.path.join(UPLOAD_FOLDER, 'jobs'))
+# 转换结果的磁盘缓存目录，重启后保留；大小上限见 result_cache.RESULT_CACHE_MAX_BYTES
+RESULT_FOLDER = os.path.abspath(os.path.join(UPLOAD_FOLDER, 'results'))
+# 部署在 nginx 等前端服务器之后时可开启，由前端直接发送结果文件（X-Sendfile）
+USE_X_SENDFILE = False
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+if not os.path.exists(JOB_FOLDER):
+    os.makedirs(JOB_FOLDER)
+
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE
+
+image_store = LRUCache(IMAGE_CACHE_MAX_BYTES, ttl=IMAGE_CACHE_TTL)
+source_store = LRUCache(SOURCE_CACHE_MAX_BYTES, ttl=IMAGE_CACHE_TTL)
+preview_tracker = PreviewTracker()
+admission = AdmissionController()
+result_cache = ResultCache(RESULT_FOLDER) if RESULT_CACHE_MAX_BYTES > 0 else None
+# 异步任务占用的准入预算，任务结束时释放
+job_costs = {}
+# 异步任务的结果缓存键，任务完成时把结果文件加入缓存
+job_keys = {}
+
+
+def observe_job(job):
+    """任务在工作进程中收集的指标随结果返回，在主进程汇总"""
+    cost = job_costs.pop(job.id, None)
+    if cost is not None:
+        admission.release(cost)
+    key = job_keys.pop(job.id, None)
+    if key is not None and job.state == 'done':
+        try:
+            result_cache.put(key, job.files[0], result_meta(job.result, job.result['output_format']))
+        except OSError as e:
+            logger.warning("结果缓存写入失败: %s", e)
+    job_metrics = metrics.RequestMetrics()
+    if job.state == 'done' and job.result:
+        job_metrics = metrics.RequestMetrics.from_dict(job.result.get('metrics', {}))
+    seconds = job.finished_at - job.created_at
+    metrics.registry.observe('job', job_metrics, status=job.state, seconds=seconds)
+
+job_manager = JobManager(on_finished=observe_job)
+
+metrics.registry.gauge('cad_cache_bytes', '缓存占用字节数', lambda: {
+    (('cache', 'image'),): image_store.current_bytes,
+    (('cache', 'source'),): source_store.current_bytes,
+    (('cache', 'stage'),): stage_cache.current_bytes,
+    **({(('cache', 'result'),): result_cache.current_bytes} if result_cache is not None else {}),
+})
+metrics.registry.gauge('cad_import_seconds', '依赖模块首次导入耗时', lambda: {
+    (('module', name),): round(seconds, 6) for name, seconds in startup.import_seconds.items()
+})
+metrics.registry.gauge('cad_admission', '准入控制：占用的内存预算、执行中与排队的请求数、累计拒绝数', lambda: {
+    (('state', 'budget_bytes'),): admission.in_use,
+    (('state', 'active'),): admission.active,
+    (('state', 'waiting'),): admission.waiting,
+    (('state', 'rejected'),): admission.rejected,
+})
+metrics.registry.gauge('cad_cache_entries', '缓存条目数', lambda: {
+    (('cache', 'image'),): len(image_store),
+    (('cache', 'source'),): len(source_store),
+    (('cache', 'stage'),): len(stage_cache),
+    **({(('cache', 'result'),): len(result_cache)} if result_cache is not None else {}),
+})
+metrics.registry.gauge('cad_result_cache', '结果缓存的累计命中与未命中次数', lambda: {
+    (('outcome', 'hit'),): result_cache.hits,
+    (('outcome', 'miss'),): result_cache.misses,
+} if result_cache is not None else {})
+
+
+class ImageSessionExpired(Exception):
+    """图片会话不存在或已过期，客户端需要重新上传"""
+
+def image_cost(img, params, source=None):
+    """按图像像素数与转换参数估算准入成本
+
+    全分辨率模式处理原图（source），按头部读出的原图尺寸计；尺寸未知时按整个预算计，单独执行。
+    """
+    if params['full_resolution']:
+        pixels = source_pixels(source)
+        if pixels is None:
+            return float('inf')
+    else:
+        h, w = img.shape[:2]
+        pixels = h * w
+    return estimate_cost(pixels, params['single_line'], params['high_precision'], levels=len(params['thresholds']))
 
 def clean_memory(*arrays):
     """显式释放 numpy 数组内存"""
     for arr in arrays:
         if arr is not None:
             del arr
-    gc.collect()
-
-def interpolate_points(points, factor=8):
-    """插值增加点数，提高曲线精度"""
-    if len(points) < 3:
-        print(f"点数太少({len(points)})，不进行插值")
-        return points
-    
-    print(f"开始插值：原始点数={len(points)}，倍数={factor}")
-    new_points = []
-    
-    for i in range(len(points)):
-        new_points.append(points[i])
-        
-        # 在当前点和下一个点之间插入新点
-        next_i = (i + 1) % len(points)
-        x1, y1 = points[i]
-        x2, y2 = points[next_i]
-        
-        # 插值增加点数 - 确保每个间隔都插入factor-1个点
-        for j in range(1, factor):
-            t = j / factor
-            x = x1 + (x2 - x1) * t
-            y = y1 + (y2 - y1) * t
-            new_points.append((x, y))
-    
-    print(f"插值完成：新点数={len(new_points)}，增加了{len(new_points) - len(points)}个点")
-    return new_points
-
-def smooth_curve(points):
-    """使用样条曲线平滑轮廓"""
-    if len(points) < 3:
-        return points
-    
-    try:
-        from scipy import interpolate
-        import numpy as np
-        
-        # 提取x和y坐标
-        x_coords = np.array([p[0] for p in points])
-        y_coords = np.array([p[1] for p in points])
-        
-        # 闭合曲线：添加第一个点到末尾
-        x_coords = np.append(x_coords, x_coords[0])
-        y_coords = np.append(y_coords, y_coords[0])
-        
-        # 计算参数t
-        t = np.arange(len(x_coords))
-        
-        # 创建样条插值
-        tck = interpolate.splrep(t, np.vstack([x_coords, y_coords]).T, s=0, per=True)
-        
-        # 生成更密集的点
-        t_new = np.linspace(0, len(x_coords) - 1, len(x_coords) * 8)
-        smooth_points = interpolate.splev(t_new, tck)
-        
-        # 转换为点列表
-        result = [(float(smooth_points[0][i]), float(smooth_points[1][i])) for i in range(len(smooth_points[0]))]
-        
-        return result
-    except ImportError:
-        # 如果scipy不可用，使用简单的线性插值
-        return interpolate_points(points, factor=8)
-    except Exception as e:
-        # 如果样条插值失败，使用简单的线性插值
-        print(f"平滑曲线失败: {e}")
-        return interpolate_points(points, factor=8)
+    with metrics.timed('gc'):
+        gc.collect()
+
+def store_image(data, image_id=None):
+    """按内容哈希保存解码后的图像，返回 (image_id, img)；已算好哈希时通过 image_id 传入"""
+    image_id = image_id or hashlib.sha256(data).hexdigest()
+    img = image_store.get(image_id)
+    if img is None:
+        img = decode_image(data)
+        image_store.put(image_id, img)
+    if image_id not in source_store:
+        source_store.put(image_id, bytes(data))
+    return image_id, img
+
+def load_source(image_id, params):
+    """全分辨率模式需要原始上传字节，其余模式返回 None"""
+    if not params['full_resolution']:
+        return None
+    data = source_store.get(image_id)
+    if data is None:
+        raise ImageSessionExpired(image_id)
+    return data
+
+def request_image_id():
+    """请求对应图像的内容哈希（image_id 会话或上传文件的 SHA-256），不解码图像
+
+    上传文件的哈希记在 g 中，load_request_image 保存图像时不再重复计算。
+    """
+    image_id = request.form.get('image_id')
+    if image_id:
+        return image_id
+    if 'upload_image_id' not in g:
+        file = request.files['image']
+        g.upload_image_id = hashlib.sha256(file.read()).hexdigest()
+        file.seek(0)
+    return g.upload_image_id
+
+def request_result_key(params):
+    """结果缓存键；未启用结果缓存时返回 None"""
+    if result_cache is None:
+        return None
+    return result_key(request_image_id(), params)
+
+def result_meta(stats, fmt):
+    """随缓存结果保存的统计信息（不含本次请求的指标）"""
+    meta = {name: value for name, value in stats.items() if name != 'metrics'}
+    meta['output_format'] = fmt
+    return meta
+
+def load_request_image():
+    """从请求中取得图像：优先使用 image_id 会话，否则读取上传文件"""
+    image_id = request.form.get('image_id')
+    if image_id:
+        img = image_store.get(image_id)
+        if img is None:
+            raise ImageSessionExpired(image_id)
+        return image_id, img
+
+    file = request.files['image']
+    return store_image(file.read(), g.get('upload_image_id'))
+
+@app.before_request
+def start_request_metrics():
+    g.metrics, g.metrics_token = metrics.begin()
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def limit_upload_size():
+    """按 Content-Length 拒绝超限的上传，不读取请求体（分块上传在读取时由 werkzeug 截断）"""
+    if request.endpoint == 'convert_batch':
+        request.max_content_length = BATCH_MAX_UPLOAD_BYTES
+    limit = request.max_content_length
+    if limit is not None and (request.content_length or 0) > limit:
+        return f'上传文件超过 {limit // (1024 * 1024)} MB 上限', 413
+
+@app.after_request
+def finish_request_metrics(response):
+    """汇总本次请求的指标，并按配置附加 Server-Timing 响应头"""
+    request_metrics = g.get('metrics')
+    if request_metrics is None or request.endpoint in (None, 'static', 'metrics_endpoint'):
+        return response
+    seconds = time.perf_counter() - g.request_start
+    request_metrics.add_count('peak_rss_bytes', metrics.peak_rss_bytes())
+    metrics.registry.observe(request.endpoint, request_metrics, status=response.status_code, seconds=seconds)
+    if SERVER_TIMING and request_metrics.stages:
+        response.headers['Server-Timing'] = request_metrics.server_timing() + f', total;dur={seconds * 1000:.1f}'
+    return response
+
+@app.teardown_request
+def end_request_metrics(exc):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        metrics.end(token)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式的性能指标"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -96,218 +251,276 @@ def index():
 def multi_image():
     return render_template('multi_image.html')
 
+@app.route('/upload_image', methods=['POST'])
+def upload_image():
+    """上传一次图片，返回后续预览/导出使用的会话令牌"""
+    try:
+        file = request.files['image']
+        image_id, img = store_image(file.read())
+        h, w = img.shape[:2]
+        return jsonify({'status': 'success', 'image_id': image_id, 'width': w, 'height': h})
+    except Exception as e:
+        logger.error("Upload Error: %s", e)
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/process_preview', methods=['POST'])
 def process_preview():
-    """预览接口逻辑保持不变，主要用于二值化处理"""
+    """二值化预览：按显示尺寸缩小后直接返回图片字节
+
+    max_width/max_height 为浏览器的显示尺寸（0 表示原尺寸），format 为 png 或 webp；
+    encoding=base64 时按旧接口返回包含 base64 PNG 的 JSON。
+    渐进式预览：pass=fast 在缩小的图像上计算，立即返回；pass=full 为完整分辨率。
+    带 client_id/seq 时，同一客户端出现更新的序号后，旧的完整预览在阶段之间中止并返回 409。
+    """
     try:
-        file = request.files['image']
         threshold = int(request.form.get('threshold', 128))
         invert = request.form.get('invert') == 'true'
         single_line = request.form.get('single_line') == 'true'
         ignore_border = request.form.get('ignore_border') == 'true'
         fill_color = request.form.get('fill_color', 'none')
-
-        in_memory_file = np.frombuffer(file.read(), np.uint8)
-        img = cv2.imdecode(in_memory_file, cv2.IMREAD_COLOR)
-        
-        # 缩放
+        max_width = int(request.form.get('max_width') or 0)
+        max_height = int(request.form.get('max_height') or 0)
+        fmt = request.form.get('format', 'png')
+        if fmt not in PREVIEW_FORMATS:
+            raise ValueError(f"不支持的预览格式: {fmt}")
+        fast = request.form.get('pass') == 'fast'
+
+        image_id, img = load_request_image()
+
+        check = None
+        if request.form.get('seq'):
+            client_id = request.form.get('client_id') or request.remote_addr
+            seq = int(request.form['seq'])
+            if not preview_tracker.begin(client_id, seq):
+                raise PreviewSuperseded(client_id)
+            if not fast:
+                check = preview_tracker.checker(client_id, seq)
+
+        if fast:
+            # 快速预览：在缩小的图像上走同一条流水线，缓存与完整分辨率互不影响
+            image_id, img = decimate(image_id, img, FAST_PREVIEW_WIDTH)
+
+        # 预处理流水线：各阶段结果按参数缓存，只改下游参数时直接复用
         h, w = img.shape[:2]
-        if w > MAX_WIDTH:
-            scale = MAX_WIDTH / w
-            img = cv2.resize(img, (MAX_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
-            final_h, final_w = img.shape[:2]
-        else:
-            final_h, final_w = h, w
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        if invert:
-            _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
-        else:
-            _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
-
-        # 忽略边缘处理
-        if ignore_border:
-            # 添加白色边框，将主体内容与图像边缘分离
-            border_size = 10
-            # 使用白色填充边框
-            binary = cv2.copyMakeBorder(binary, border_size, border_size, border_size, border_size, 
-                                      cv2.BORDER_CONSTANT, value=255)
-            # 记录新的尺寸
-            final_h, final_w = binary.shape[:2]
-
-        # 单线条模式处理 - 使用scikit-image的骨架化算法
-        if single_line:
-            from skimage.morphology import skeletonize
-            # 确保二值图像是0和1
-            binary_bool = (binary > 0)
-            # 使用scikit-image的骨架化算法
-            skeleton = skeletonize(binary_bool)
-            # 转换回0-255格式
-            binary = (skeleton * 255).astype(np.uint8)
-
-        _, buffer = cv2.imencode('.png', binary)
-        img_str = base64.b64encode(buffer).decode('utf-8')
-
-        clean_memory(img, gray, binary, in_memory_file)
-        return jsonify({'status': 'success', 'image': img_str})
-
+        with admission.admit(estimate_cost(h * w, single_line)):
+            binary = preprocess(image_id, img, threshold, invert, ignore_border, single_line, check=check)
+        final_h, final_w = binary.shape[:2]
+        if check:
+            check()
+
+        if request.form.get('encoding') == 'base64':
+            # 旧接口：完整尺寸 PNG，base64 后放在 JSON 中
+            _, buffer = cv2.imencode('.png', binary)
+            img_str = base64.b64encode(buffer).decode('utf-8')
+            clean_memory(img, binary)
+            return jsonify({'status': 'success', 'image': img_str})
+
+        data, mimetype = encode_preview(binary, max_width, max_height, fmt)
+        clean_memory(img, binary)
+        response = Response(data, mimetype=mimetype)
+        response.headers['X-Image-Width'] = str(final_w)
+        response.headers['X-Image-Height'] = str(final_h)
+        return response
+
+    except ImageSessionExpired:
+        return jsonify({'status': 'expired', 'message': '图片会话已过期，请重新上传'}), 410
+    except PreviewSuperseded:
+        return jsonify({'status': 'superseded', 'message': '已有更新的预览请求'}), 409
+    except Overloaded as e:
+        return jsonify({'status': 'busy', 'message': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Preview Error: %s", e)
         return jsonify({'status': 'error', 'message': str(e)})
 
-@app.route('/convert_dxf', methods=['POST'])
-def convert_dxf():
-    """使用 OpenCV 轮廓检测进行矢量化"""
+@app.route('/threshold_sweep', methods=['POST'])
+def threshold_sweep_endpoint():
+    """阈值建议与扫描曲线：Otsu/三角法阈值、灰度直方图，以及各扫描阈值下的前景像素数与轮廓数
+
+    结果按图像缓存，界面据此绘制曲线并吸附到合适的阈值，不必逐个阈值请求预览。
+    step 为扫描间隔（灰度级，默认 SWEEP_STEP）。
+    """
     try:
-        file = request.files['image']
-        threshold = int(request.form.get('threshold', 128))
         invert = request.form.get('invert') == 'true'
-        single_line = request.form.get('single_line') == 'true'
         ignore_border = request.form.get('ignore_border') == 'true'
-        fill_color = request.form.get('fill_color', 'none')
-        high_precision = request.form.get('high_precision', 'none')
-
-        in_memory_file = np.frombuffer(file.read(), np.uint8)
-        img = cv2.imdecode(in_memory_file, cv2.IMREAD_COLOR)
+        step = int(request.form.get('step') or SWEEP_STEP)
+        image_id, img = load_request_image()
 
         h, w = img.shape[:2]
-        if w > MAX_WIDTH:
-            scale = MAX_WIDTH / w
-            img = cv2.resize(img, (MAX_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
-            final_h, final_w = img.shape[:2]
-        else:
-            final_h, final_w = h, w
+        with admission.admit(estimate_cost(h * w)):
+            sweep = threshold_sweep(image_id, img, invert, ignore_border, step)
+        return jsonify({'status': 'success', 'image_id': image_id, 'width': w, 'height': h, **sweep})
+
+    except ImageSessionExpired:
+        return jsonify({'status': 'expired', 'message': '图片会话已过期，请重新上传'}), 410
+    except Overloaded as e:
+        return jsonify({'status': 'busy', 'message': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error("Threshold Sweep Error: %s", e)
+        return jsonify({'status': 'error', 'message': str(e)})
 
-        # 1. 预处理
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        if invert:
-            _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
-        else:
-            _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
-
-        # 忽略边缘处理
-        if ignore_border:
-            # 添加白色边框，将主体内容与图像边缘分离
-            border_size = 10
-            # 使用白色填充边框
-            binary = cv2.copyMakeBorder(binary, border_size, border_size, border_size, border_size, 
-                                      cv2.BORDER_CONSTANT, value=255)
-            # 记录新的尺寸
-            final_h, final_w = binary.shape[:2]
-
-        # 单线条模式处理 - 使用scikit-image的骨架化算法
-        if single_line:
-            from skimage.morphology import skeletonize
-            # 确保二值图像是0和1
-            binary_bool = (binary > 0)
-            # 使用scikit-image的骨架化算法
-            skeleton = skeletonize(binary_bool)
-            # 转换回0-255格式
-            binary = (skeleton * 255).astype(np.uint8)
-
-        # 2. 使用 OpenCV 查找轮廓 - 提取所有轮廓
-        # 使用RETR_LIST提取所有轮廓（包括内部），避免只识别边框
-        
-        # 根据高精度模式选择轮廓近似方法
-        if high_precision.startswith('more_points_'):
-            # 模式1：增加曲线数量 - 保留所有轮廓点
-            # 提取倍数
-            factor = int(high_precision.split('_')[1])
-            print(f"高精度模式：增加曲线数量，倍数={factor}")
-            # 使用CHAIN_APPROX_SIMPLE进行轮廓近似，然后插值
-            contours, hierarchy = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-            print(f"轮廓数量：{len(contours)}，使用CHAIN_APPROX_SIMPLE")
+@app.route('/convert_dxf', methods=['POST'])
+def convert_dxf():
+    """使用 OpenCV 轮廓检测进行矢量化（同步接口，在请求线程中执行）"""
+    try:
+        params = parse_convert_params(request.form)
+    except ValueError as e:
+        return str(e), 400
+    try:
+        fmt = params['output_format']
+        key = request_result_key(params)
+        cached = result_cache.get(key) if key is not None else None
+        if cached is not None:
+            # 相同图片与参数已转换过：直接返回缓存文件，不解码、不占用准入预算
+            file, stats = cached
+            response = file_response(file, fmt, download_name='opencv_vector', etag=key)
         else:
-            # 默认模式：使用CHAIN_APPROX_SIMPLE进行轮廓近似，减少重复点
-            print(f"高精度模式：{high_precision}")
-            contours, hierarchy = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-            print(f"轮廓数量：{len(contours)}，使用CHAIN_APPROX_SIMPLE")
-
-        # 3. 生成 DXF
-        doc = ezdxf.new('R2000')
-        msp = doc.modelspace()
-        doc.layers.new('OPENCV_OUTLINE', dxfattribs={'color': 7})
-
-        total_curves = 0
-
-        # 遍历所有轮廓
-        for contour in contours:
-            # 将轮廓转换为点列表
-            points = []
-            for point in contour:
-                x, y = point[0]
-                points.append((float(x), float(y)))
-
-            # 高精度模式处理
-            if high_precision.startswith('more_points_') and len(points) > 2:
-                # 模式1：增加曲线数量 - 插值增加点数
-                # 使用从参数中提取的倍数
-                factor = int(high_precision.split('_')[1])
-                print(f"原始点数：{len(points)}，倍数：{factor}")
-                points = interpolate_points(points, factor=factor)
-                print(f"插值后点数：{len(points)}")
-            elif high_precision == 'curve_edge' and len(points) > 2:
-                # 模式2：曲线边缘 - 使用样条曲线
-                print(f"原始点数：{len(points)}，使用曲线边缘")
-                points = smooth_curve(points)
-                print(f"平滑后点数：{len(points)}")
-
-            # 过滤太短的轮廓（噪点）
-            if len(points) > 2:
-                # 设置填充颜色
-                dxfattribs = {'layer': 'OPENCV_OUTLINE', 'closed': True}
-                
-                # 添加填充
-                if fill_color != 'none':
-                    if len(points) >= 3:
-                        if fill_color == 'black':
-                            solid_color = 0
-                        else:  # white
-                            solid_color = 7
-                        
-                        # 使用多个SOLID实体填充整个区域
-                        # 将多边形分解为多个三角形
-                        for i in range(1, len(points) - 1):
-                            msp.add_solid(
-                                points[0],
-                                points[i],
-                                points[i+1],
-                                points[i+1],
-                                dxfattribs={'layer': 'OPENCV_OUTLINE', 'color': solid_color}
-                            )
-                
-                # 添加线条
-                msp.add_lwpolyline(points, dxfattribs=dxfattribs)
-                total_curves += 1
-
-        print(f"OpenCV found {total_curves} contours.")
-
-        # 清理大内存
-        clean_memory(img, gray, binary, in_memory_file)
-
-        # 流式返回 - 使用StringIO
-        from io import StringIO
-        string_stream = StringIO()
-        doc.write(string_stream)
-        
-        # 转换为BytesIO
-        dxf_stream = io.BytesIO()
-        dxf_stream.write(string_stream.getvalue().encode('utf-8'))
-        dxf_stream.seek(0)
-
-        return send_file(
-            dxf_stream,
-            as_attachment=True,
-            download_name='opencv_vector.dxf',
-            mimetype='application/dxf'
-        )
-
+            image_id, img = load_request_image()
+            source = load_source(image_id, params)
+
+            # 转换与序列化都在准入预算内执行
+            with admission.admit(image_cost(img, params, source)):
+                doc, stats = convert(image_id, img, params, source=source)
+
+                # 清理大内存
+                clean_memory(img, source)
+
+                if key is None:
+                    # 流式返回 - 按所选格式增量写入溢出式临时文件，超过阈值后转存磁盘
+                    response = dxf_response(doc, fmt, download_name='opencv_vector')
+                else:
+                    # 写入缓存目录的临时文件，先打开再原子重命名进缓存，即使随即被淘汰也能完整发送
+                    path = result_cache.temp_path()
+                    try:
+                        write_dxf_file(doc, path, fmt)
+                        file = open(path, 'rb')
+                    except Exception:
+                        os.remove(path)
+                        raise
+                    try:
+                        result_cache.put(key, path, result_meta(stats, fmt), move=True)
+                    except OSError as e:
+                        # 缓存写入失败不影响本次响应：已打开的临时文件照常发送
+                        logger.warning("结果缓存写入失败: %s", e)
+                    response = file_response(file, fmt, download_name='opencv_vector', etag=key)
+        response.headers['X-Vertex-Count-Before'] = str(stats['vertices_before'])
+        response.headers['X-Vertex-Count-After'] = str(stats['vertices_after'])
+        return response
+
+    except ImageSessionExpired:
+        return '图片会话已过期，请重新上传', 410
+    except Overloaded as e:
+        return str(e), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
-        import traceback
-        print(f"Conversion Error: {e}")
-        traceback.print_exc()
+        logger.exception("Conversion Error: %s", e)
         return str(e), 500
 
+@app.route('/jobs/submit', methods=['POST'])
+def submit_job():
+    """提交异步矢量化任务，立即返回任务ID，转换在进程池中执行"""
+    try:
+        params = parse_convert_params(request.form)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        job_id = uuid.uuid4().hex
+        path = os.path.join(JOB_FOLDER, output_filename(job_id, params['output_format']))
+        key = request_result_key(params)
+        cached = result_cache.get(key) if key is not None else None
+        if cached is not None:
+            # 缓存命中：结果文件链接到任务目录，任务立即完成
+            file, stats = cached
+            file.close()
+            if result_cache.link_to(key, path):
+                job_manager.add_done(job_id, stats, files=[path])
+                return jsonify({'status': 'success', 'job_id': job_id}), 202
+
+        image_id, img = load_request_image()
+        source = load_source(image_id, params)
+
+        # 任务在工作进程中执行，预算在任务结束时（observe_job）释放
+        job_costs[job_id] = admission.acquire(image_cost(img, params, source))
+        if key is not None:
+            job_keys[job_id] = key
+        try:
+            job_manager.submit(job_id, convert_to_file, (image_id, img, params, source, path), files=[path])
+        except Exception:
+            admission.release(job_costs.pop(job_id))
+            job_keys.pop(job_id, None)
+            raise
+        return jsonify({'status': 'success', 'job_id': job_id}), 202
+
+    except ImageSessionExpired:
+        return jsonify({'status': 'expired', 'message': '图片会话已过期，请重新上传'}), 410
+    except Overloaded as e:
+        return jsonify({'status': 'busy', 'message': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error("Submit Error: %s", e)
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """查询任务状态与进度"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '任务不存在或已过期'}), 404
+    return jsonify({'status': 'success', **job_manager.status(job)})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消任务"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '任务不存在或已过期'}), 404
+    return jsonify({'status': 'success', **job_manager.status(job)})
+
+@app.route('/jobs/<job_id>/download', methods=['GET'])
+def download_job(job_id):
+    """下载已完成任务的结果文件（DXF 或提交时选择的其他格式）"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return '任务不存在或已过期', 404
+    if job.state != 'done':
+        return jsonify({'status': 'error', **job_manager.status(job)}), 409
+
+    fmt = job.result['output_format']
+    response = send_file(job.files[0], as_attachment=True,
+                         download_name=output_filename('opencv_vector', fmt), mimetype=output_mimetype(fmt))
+    response.headers['X-Vertex-Count-Before'] = str(job.result['vertices_before'])
+    response.headers['X-Vertex-Count-After'] = str(job.result['vertices_after'])
+    return response
+
+@app.route('/convert_batch', methods=['POST'])
+def convert_batch():
+    """批量转换：多张图片（images）或 zip 压缩包（archive）使用同一组参数，返回 DXF 的 zip"""
+    try:
+        params = parse_convert_params(request.form)
+        files = request.files.getlist('images')
+        archive = request.files.get('archive')
+        if not files and archive is None:
+            return '请上传图片或zip压缩包', 400
+        # 上传文件在视图返回后关闭，先转存到临时文件并校验压缩包
+        images = iter_uploaded_images(files, archive)
+    except Exception as e:
+        logger.error("Batch Error: %s", e)
+        return str(e), 400
+
+    # 第一张图片在开始响应前占用准入预算，繁忙时与单张转换一样返回 503
+    try:
+        first = admit_first(admission, images, params)
+    except Overloaded as e:
+        images.close()
+        return str(e), 503, {'Retry-After': str(e.retry_after)}
+
+    # 边转换边输出，每完成一张图片就写入 zip；每张图片的预算在其任务结束时释放
+    chunks = stream_batch_zip(job_manager, admission, images, params, JOB_FOLDER, first=first)
+    return Response(chunks, mimetype='application/zip',
+                    headers={'Content-Disposition': 'attachment; filename=opencv_vector_batch.zip'})
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=7869, debug=True, threaded=True)
+    # 打包为可执行文件后，进程池的子进程需要经由此入口启动
+    multiprocessing.freeze_support()
+    startup.prepare(STARTUP_MODE)
+    if SERVE_MODE == 'production':
+        serving.serve(app, '0.0.0.0', 7869)
+    else:
+        app.run(host='0.0.0.0', port=7869, debug=True, threaded=True)
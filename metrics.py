@@ -0,0 +1,215 @@
+"""
+性能指标
+按请求记录各阶段耗时与轮廓/顶点数，汇总为 Prometheus 文本格式供 /metrics 抓取，
+并可生成 Server-Timing 响应头
+"""
+
+import contextvars
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的桶上界（秒）
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def peak_rss_bytes():
+    """进程的峰值常驻内存（字节），无法获取时返回 0"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return 0
+
+
+class RequestMetrics:
+    """一次请求（或一个任务）的阶段耗时与计数"""
+
+    def __init__(self, stages=None, counts=None):
+        self.stages = dict(stages or {})
+        self.counts = dict(counts or {})
+
+    def add_time(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_count(self, name, n):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def as_dict(self):
+        return {'stages': dict(self.stages), 'counts': dict(self.counts)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('stages'), data.get('counts'))
+
+    def server_timing(self):
+        """生成 Server-Timing 响应头的值（毫秒）"""
+        return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.stages.items())
+
+
+def begin():
+    """开始记录当前请求，返回 (指标对象, 用于 end 的令牌)"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """在 with 块内记录指标（用于请求之外，例如任务进程）"""
+    metrics, token = begin()
+    try:
+        yield metrics
+    finally:
+        end(token)
+
+
+def add_time(stage, seconds):
+    """把已测得的耗时累加到当前请求（逐轮廓的阶段在本地累加后一次写入）"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_time(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """记录代码块耗时到当前请求的指标中，没有正在记录的请求时只计时不保存"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_time(stage, time.perf_counter() - start)
+
+
+def count(name, n):
+    """累加当前请求的计数（轮廓数、顶点数等）"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_count(name, n)
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.total += value
+        self.n += 1
+
+
+def _labels(**labels):
+    return ','.join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class MetricsRegistry:
+    """进程内汇总的指标，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stage_seconds = {}
+        self._request_seconds = {}
+        self._requests = {}
+        self._items = {}
+        self._gauges = []
+        self.peak_rss = 0
+
+    def gauge(self, name, help_text, func):
+        """注册在抓取时计算的仪表值，func 返回 {标签字典的元组: 值} 或单个数值"""
+        self._gauges.append((name, help_text, func))
+
+    def observe(self, endpoint, metrics, status=200, seconds=None):
+        """汇总一次请求或任务的指标"""
+        with self._lock:
+            key = (endpoint, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if seconds is not None:
+                self._request_seconds.setdefault(endpoint, _Histogram()).observe(seconds)
+            for stage, value in metrics.stages.items():
+                self._stage_seconds.setdefault(stage, _Histogram()).observe(value)
+            for name, value in metrics.counts.items():
+                if name == 'peak_rss_bytes':
+                    self.peak_rss = max(self.peak_rss, value)
+                else:
+                    self._items[name] = self._items.get(name, 0) + value
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_histograms(lines, 'cad_stage_duration_seconds',
+                                    '各处理阶段耗时', 'stage', self._stage_seconds)
+            self._render_histograms(lines, 'cad_request_duration_seconds',
+                                    '请求总耗时', 'endpoint', self._request_seconds)
+            lines.append('# HELP cad_requests_total 请求数')
+            lines.append('# TYPE cad_requests_total counter')
+            for (endpoint, status), n in sorted(self._requests.items()):
+                lines.append(f'cad_requests_total{{{_labels(endpoint=endpoint, status=status)}}} {n}')
+            lines.append('# HELP cad_items_total 处理的轮廓、顶点和输出字节数')
+            lines.append('# TYPE cad_items_total counter')
+            for name, n in sorted(self._items.items()):
+                lines.append(f'cad_items_total{{{_labels(kind=name)}}} {n}')
+            peak = max(self.peak_rss, peak_rss_bytes())
+        lines.append('# HELP cad_peak_rss_bytes 进程峰值常驻内存')
+        lines.append('# TYPE cad_peak_rss_bytes gauge')
+        lines.append(f'cad_peak_rss_bytes {peak}')
+        for name, help_text, func in self._gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            value = func()
+            if isinstance(value, dict):
+                for labels, v in value.items():
+                    lines.append(f'{name}{{{_labels(**dict(labels))}}} {v}')
+            else:
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, help_text, label, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, hist in sorted(histograms.items()):
+            for bound, n in zip(DURATION_BUCKETS, hist.buckets):
+                lines.append(f'{name}_bucket{{{_labels(**{label: key}, le=bound)}}} {n}')
+            lines.append(f'{name}_bucket{{{_labels(**{label: key}, le="+Inf")}}} {hist.n}')
+            lines.append(f'{name}_sum{{{_labels(**{label: key})}}} {hist.total:.6f}')
+            lines.append(f'{name}_count{{{_labels(**{label: key})}}} {hist.n}')
+
+
+registry = MetricsRegistry()
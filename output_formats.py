@@ -0,0 +1,88 @@
+"""
+输出格式
+同一个 ezdxf 文档可以编码为：
+  dxf        - ASCII DXF（默认，兼容性最好）
+  dxf_binary - 二进制 DXF，写入和解析都更快，体积更小
+  dxf_gz     - gzip 压缩的 ASCII DXF
+  dxf_zip    - 只含一个 DXF 的 zip 压缩包
+  svg        - SVG 路径，供网页直接显示
+所有格式都增量写入二进制流，不在内存中拼出完整输出
+"""
+
+import gzip
+import io
+import zipfile
+
+from svg_export import write_svg
+
+# 格式名 → (文件扩展名, MIME 类型)
+OUTPUT_FORMATS = {
+    'dxf': ('.dxf', 'application/dxf'),
+    'dxf_binary': ('.dxf', 'application/dxf'),
+    'dxf_gz': ('.dxf.gz', 'application/gzip'),
+    'dxf_zip': ('.zip', 'application/zip'),
+    'svg': ('.svg', 'image/svg+xml'),
+}
+# 压缩级别：DXF 文本重复度高，级别 6 以上体积几乎不再减小，耗时却成倍增加
+COMPRESS_LEVEL = 6
+# dxf_zip 中 DXF 文件的名称
+ZIP_ENTRY_NAME = 'opencv_vector.dxf'
+
+
+def output_filename(base, fmt):
+    """不带扩展名的文件名 + 格式对应的扩展名"""
+    return base + OUTPUT_FORMATS[fmt][0]
+
+
+def output_mimetype(fmt):
+    return OUTPUT_FORMATS[fmt][1]
+
+
+def _write_ascii(doc, stream):
+    # ezdxf 逐个标签写入文本流，由 TextIOWrapper 增量编码到底层流
+    text_stream = io.TextIOWrapper(stream, encoding=doc.output_encoding,
+                                   errors='dxfreplace', newline='')
+    doc.write(text_stream)
+    text_stream.flush()
+    # 分离包装器，避免其被回收时关闭底层流
+    text_stream.detach()
+
+
+def _write_binary(doc, stream):
+    doc.write(stream, fmt='bin')
+
+
+def _write_gzip(doc, stream):
+    # mtime=0：相同的文档得到相同的字节，便于缓存与比对
+    with gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=COMPRESS_LEVEL, mtime=0) as gz:
+        _write_ascii(doc, gz)
+
+
+def _write_zip(doc, stream):
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=COMPRESS_LEVEL) as zf:
+        with zf.open(ZIP_ENTRY_NAME, 'w') as entry:
+            _write_ascii(doc, entry)
+
+
+def _write_svg(doc, stream):
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    write_svg(doc, text_stream)
+    text_stream.flush()
+    text_stream.detach()
+
+
+_WRITERS = {
+    'dxf': _write_ascii,
+    'dxf_binary': _write_binary,
+    'dxf_gz': _write_gzip,
+    'dxf_zip': _write_zip,
+    'svg': _write_svg,
+}
+
+
+def write_document(doc, stream, fmt='dxf'):
+    """把文档按 fmt 编码写入二进制流（流不会被关闭）"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+    _WRITERS[fmt](doc, stream)
@@ -0,0 +1,399 @@
+"""
+图像预处理流水线
+解码 → 灰度 → 二值化 → 加边框 → 骨架化，每个阶段的结果按
+(图像哈希, 影响该阶段的参数) 缓存，只改下游参数时复用上游结果
+"""
+
+import numpy as np
+import cv2
+
+from cache import LRUCache
+from metrics import timed
+from thinning import resolve_backend, thin
+
+# 阶段缓存的内存预算
+STAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 解码后图像的最大宽度，超过时等比缩小
+MAX_WIDTH = 2000
+BORDER_SIZE = 10
+# 单线条模式的骨架化后端：auto / opencv / zhang_suen / guo_hall / skimage，见 thinning.py
+THINNING_BACKEND = 'auto'
+
+stage_cache = LRUCache(STAGE_CACHE_MAX_BYTES)
+
+
+def _frozen(arr):
+    """缓存中的数组在请求间共享，禁止原地修改"""
+    arr.flags.writeable = False
+    return arr
+
+
+# JPEG 可在解码时按 1/2、1/4、1/8 缩小（DCT 域缩放），从大到小选择
+_REDUCED_GRAYSCALE = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+# 含尺寸信息的 JPEG 帧头（SOF0-SOF15，C4/C8/CC 不是帧头）
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_header(data):
+    """读取 JPEG 头部，返回 (宽, 高, 是否含 EXIF)；不是 JPEG 或头部不完整时返回 None
+
+    只扫描图像数据（SOS）之前的标记段，不解码。
+    """
+    if data[:2] != b'\xff\xd8':
+        return None
+    exif = False
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # 填充字节
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker == 0xDA:
+            return None
+        if marker == 0xE1 and data[i + 4:i + 10] == b'Exif\x00\x00':
+            exif = True
+        elif marker in _JPEG_SOF and i + 9 <= len(data):
+            h = int.from_bytes(data[i + 5:i + 7], 'big')
+            w = int.from_bytes(data[i + 7:i + 9], 'big')
+            return w, h, exif
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def image_size(data):
+    """从 JPEG 或 PNG 头部读取 (宽, 高)，不解码；其他格式返回 None"""
+    header = jpeg_header(data)
+    if header is not None:
+        return header[:2]
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    return None
+
+
+def source_pixels(data):
+    """原图的像素数（全分辨率模式按原图处理）；无法从头部得到尺寸时返回 None"""
+    size = image_size(data)
+    if size is None:
+        return None
+    return size[0] * size[1]
+
+
+def decoded_pixels(data):
+    """decode_image 输出的像素数（缩放到 MAX_WIDTH 以内）；无法从头部得到尺寸时返回 None"""
+    size = image_size(data)
+    if size is None:
+        return None
+    w, h = size
+    if w > MAX_WIDTH:
+        h = int(h * MAX_WIDTH / w)
+        w = MAX_WIDTH
+    return w * h
+
+
+def _decode_flags(data, max_width):
+    """选择解码方式，返回 (imdecode 标志, 缩小倍数, JPEG 原图 (宽, 高) 或 None)
+
+    JPEG 选择最大的缩小倍数，使缩小后的宽度仍不小于 max_width；含 EXIF 时图像可能被旋转，
+    按较短边判断。不需要缩小的 JPEG 与其他格式按彩色完整解码，灰度化方式与原先一致。
+    """
+    header = jpeg_header(data)
+    if header is None:
+        return cv2.IMREAD_COLOR, 1, None
+    w, h, exif = header
+    width = min(w, h) if exif else w
+    for factor, flags in _REDUCED_GRAYSCALE:
+        if width // factor >= max_width:
+            return flags, factor, (w, h)
+    return cv2.IMREAD_COLOR, 1, (w, h)
+
+
+def decode_image(data):
+    """解码为灰度图并缩放到 MAX_WIDTH 以内
+
+    大尺寸 JPEG 按头部尺寸直接缩小解码为单通道，最后用一次 INTER_AREA 缩放到 MAX_WIDTH，
+    输出尺寸与完整解码后缩放一致。其余图片按彩色解码、缩放后再转灰度，像素值与原先的
+    BGR 解码 + cvtColor 完全相同（OpenCV 直接灰度解码的结果与 cvtColor 不同，会改变二值化结果）。
+    """
+    flags, factor, original = _decode_flags(data, MAX_WIDTH)
+    in_memory_file = np.frombuffer(data, np.uint8)
+    with timed('decode'):
+        img = cv2.imdecode(in_memory_file, flags)
+    if img is None:
+        raise ValueError("无法解码图片")
+
+    h, w = img.shape[:2]
+    if factor > 1:
+        # 目标尺寸按原图计算（EXIF 旋转后宽高互换），避免缩小解码的取整误差
+        ow, oh = original
+        if (w, h) != (-(-ow // factor), -(-oh // factor)):
+            ow, oh = oh, ow
+        h, w = oh, ow
+    if w > MAX_WIDTH:
+        scale = MAX_WIDTH / w
+        with timed('resize'):
+            img = cv2.resize(img, (MAX_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+    if img.ndim == 3:
+        with timed('gray'):
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # 缓存中的图像在多个请求间共享，禁止原地修改
+    return _frozen(img)
+
+
+def to_gray(image_id, img):
+    """阶段1：灰度化（decode_image 已输出灰度图，只有彩色输入需要转换）"""
+    if img.ndim == 2:
+        return img
+
+    def compute():
+        with timed('gray'):
+            return _frozen(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    return stage_cache.get_or_create(('gray', image_id), compute)
+
+
+def to_binary(image_id, img, threshold, invert):
+    """阶段2：二值化"""
+    def compute():
+        gray = to_gray(image_id, img)
+        mode = cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY
+        with timed('threshold'):
+            _, binary = cv2.threshold(gray, threshold, 255, mode)
+        return _frozen(binary)
+    return stage_cache.get_or_create(('binary', image_id, threshold, invert), compute)
+
+
+def add_border(image_id, img, threshold, invert, ignore_border):
+    """阶段3：忽略边缘时添加白色边框，将主体内容与图像边缘分离"""
+    binary = to_binary(image_id, img, threshold, invert)
+    if not ignore_border:
+        return binary
+
+    def compute():
+        with timed('border'):
+            bordered = cv2.copyMakeBorder(binary, BORDER_SIZE, BORDER_SIZE, BORDER_SIZE, BORDER_SIZE,
+                                          cv2.BORDER_CONSTANT, value=255)
+        return _frozen(bordered)
+    return stage_cache.get_or_create(('border', image_id, threshold, invert), compute)
+
+
+def skeletonize_binary(image_id, img, threshold, invert, ignore_border, check=None):
+    """阶段4：单线条模式 - 细化为单像素骨架，后端由 THINNING_BACKEND 选择"""
+    backend = resolve_backend(THINNING_BACKEND)
+
+    def compute():
+        binary = add_border(image_id, img, threshold, invert, ignore_border)
+        # 各后端直接输出 0/255 的 uint8 图像
+        with timed('skeletonize'):
+            return _frozen(thin(binary, backend, check=check))
+    return stage_cache.get_or_create(('skeleton', image_id, threshold, invert, ignore_border, backend), compute)
+
+
+def decimate(image_id, img, max_width):
+    """按最大宽度缩小图像，返回 (派生的图像ID, 图像)，供快速预览使用
+
+    缩小后的图像以派生ID进入后续阶段，与原图的缓存结果互不干扰。
+    """
+    h, w = img.shape[:2]
+    if w <= max_width:
+        return image_id, img
+
+    def compute():
+        size = (max_width, max(1, round(h * max_width / w)))
+        with timed('decimate'):
+            return _frozen(cv2.resize(img, size, interpolation=cv2.INTER_AREA))
+    small = stage_cache.get_or_create(('decimated', image_id, max_width), compute)
+    return f'{image_id}@{max_width}', small
+
+
+def _no_check():
+    pass
+
+
+def preprocess(image_id, img, threshold, invert, ignore_border, single_line, check=None):
+    """执行预处理流水线，返回用于轮廓提取的二值图（只读）
+
+    check 在每个阶段开始前调用，抛出异常即可中止（用于取消过期的预览请求）。
+    """
+    check = check or _no_check
+    check()
+    to_gray(image_id, img)
+    check()
+    to_binary(image_id, img, threshold, invert)
+    check()
+    binary = add_border(image_id, img, threshold, invert, ignore_border)
+    if single_line:
+        check()
+        return skeletonize_binary(image_id, img, threshold, invert, ignore_border, check=check)
+    return binary
+
+
+# 8 邻域偏移 (dy, dx)，正交方向在前：行走时优先沿正交方向，避免跳过拐角像素
+_WALK_OFFSETS = [(-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1)]
+# 按顺时针环绕排列的 8 邻域，用于计算交叉数
+_RING_OFFSETS = [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
+
+
+def compress_collinear(points, closed):
+    """删除同一方向上的中间点，与 CHAIN_APPROX_SIMPLE 的压缩方式一致"""
+    if len(points) < 3:
+        return points
+    if closed:
+        prev_dir = points - np.roll(points, 1, axis=0)
+        next_dir = np.roll(points, -1, axis=0) - points
+        keep = np.any(prev_dir != next_dir, axis=1)
+    else:
+        d = np.diff(points, axis=0)
+        keep = np.ones(len(points), dtype=bool)
+        keep[1:-1] = np.any(d[1:] != d[:-1], axis=1)
+    return points[keep]
+
+
+def trace_centerlines(skeleton):
+    """沿单像素骨架追踪中心线，返回 [(points, closed), ...]
+
+    以端点和交叉点为图节点，每条笔画输出一条开放折线，每个骨架像素只出现一次；
+    相邻的交叉点像素合并为一个节点，交汇的笔画共享同一个锚点；
+    没有节点的闭环输出为闭合折线。
+    """
+    padded = np.pad((skeleton > 0).astype(np.uint8), 1)
+    ys, xs = np.nonzero(padded)
+    n = len(ys)
+    if n == 0:
+        return []
+
+    index = np.full(padded.shape, -1, dtype=np.int64)
+    index[ys, xs] = np.arange(n)
+    neighbors = np.stack([index[ys + dy, xs + dx] for dy, dx in _WALK_OFFSETS], axis=1)
+    degree = np.count_nonzero(neighbors >= 0, axis=1)
+
+    # 交叉数：环绕一周时 1→0 的跳变次数，拐角处相邻的两个邻居只算一条分支
+    ring = np.stack([padded[ys + dy, xs + dx] for dy, dx in _RING_OFFSETS], axis=1)
+    crossings = np.count_nonzero((ring == 1) & (np.roll(ring, -1, axis=1) == 0), axis=1)
+
+    is_endpoint = crossings == 1
+    is_junction = (crossings >= 3) | ((crossings == 0) & (degree > 0))
+    is_node = is_endpoint | is_junction
+
+    # 相邻交叉点像素聚成一簇，以最接近簇中心的像素为锚点
+    cluster = np.full(n, -1, dtype=np.int64)
+    anchors = []
+    if is_junction.any():
+        junction_mask = np.zeros_like(padded)
+        junction_mask[ys[is_junction], xs[is_junction]] = 1
+        num_labels, labels = cv2.connectedComponents(junction_mask, connectivity=8)
+        cluster[is_junction] = labels[ys[is_junction], xs[is_junction]] - 1
+        jidx = np.flatnonzero(is_junction)
+        jlab = cluster[jidx]
+        counts = np.bincount(jlab, minlength=num_labels - 1)
+        cy = np.bincount(jlab, weights=ys[jidx], minlength=num_labels - 1) / counts
+        cx = np.bincount(jlab, weights=xs[jidx], minlength=num_labels - 1) / counts
+        dist = (ys[jidx] - cy[jlab]) ** 2 + (xs[jidx] - cx[jlab]) ** 2
+        order = np.lexsort((dist, jlab))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = jlab[order][1:] != jlab[order][:-1]
+        anchors = jidx[order][first].tolist()
+
+    nb = [[j for j in row if j >= 0] for row in neighbors.tolist()]
+    node = is_node.tolist()
+    junction = is_junction.tolist()
+    cluster = cluster.tolist()
+    visited = [False] * n
+    paths = []
+
+    def walk(start, first):
+        path = [start, first]
+        prev, cur = start, first
+        while not node[cur]:
+            visited[cur] = True
+            nxt = -1
+            for j in nb[cur]:
+                if j == prev or visited[j]:
+                    continue
+                # 不允许在拐角处立刻折回起点
+                if j == start and len(path) < 4:
+                    continue
+                nxt = j
+                break
+            if nxt < 0:
+                break
+            path.append(nxt)
+            prev, cur = cur, nxt
+        if node[cur] and not junction[cur]:
+            visited[cur] = True
+        return path
+
+    seen_pairs = set()
+    for s in np.flatnonzero(is_node).tolist():
+        if visited[s]:
+            continue
+        if not junction[s]:
+            visited[s] = True
+        for j in nb[s]:
+            if visited[j]:
+                continue
+            if node[j]:
+                # 两个节点直接相邻：同簇交叉点之间不连线，其余输出一条短线
+                if cluster[s] >= 0 and cluster[s] == cluster[j]:
+                    continue
+                pair = (min(s, j), max(s, j))
+                if pair in seen_pairs:
+                    continue
+                seen_pairs.add(pair)
+                if not junction[j]:
+                    visited[j] = True
+                paths.append(([s, j], False))
+            else:
+                paths.append((walk(s, j), False))
+
+    # 剩余未访问的像素属于不含节点的闭环
+    for s in range(n):
+        if visited[s] or node[s]:
+            continue
+        visited[s] = True
+        path = [s]
+        prev, cur = -1, s
+        while True:
+            nxt = next((j for j in nb[cur] if j != prev and not visited[j]), -1)
+            if nxt < 0:
+                break
+            visited[nxt] = True
+            path.append(nxt)
+            prev, cur = cur, nxt
+        closed = len(path) > 2 and s in nb[path[-1]]
+        paths.append((path, closed))
+
+    results = []
+    for path, closed in paths:
+        if not closed:
+            # 笔画端点落在交叉点簇上时，统一连到簇的锚点
+            head, tail = path[0], path[-1]
+            if cluster[head] >= 0 and anchors[cluster[head]] != head:
+                path.insert(0, anchors[cluster[head]])
+            if cluster[tail] >= 0 and anchors[cluster[tail]] != tail:
+                path.append(anchors[cluster[tail]])
+        idx = np.asarray(path)
+        # 去掉填充的 1 像素偏移
+        points = np.column_stack((xs[idx] - 1, ys[idx] - 1)).astype(np.float64)
+        results.append((compress_collinear(points, closed), closed))
+    return results
+
+
+def centerlines(image_id, img, threshold, invert, ignore_border):
+    """阶段5：单线条模式 - 沿骨架追踪中心线，返回 [(points, closed), ...]"""
+    backend = resolve_backend(THINNING_BACKEND)
+
+    def compute():
+        skeleton = skeletonize_binary(image_id, img, threshold, invert, ignore_border)
+        with timed('trace_centerlines'):
+            return [(_frozen(points), closed) for points, closed in trace_centerlines(skeleton)]
+    return stage_cache.get_or_create(('centerline', image_id, threshold, invert, ignore_border, backend), compute)
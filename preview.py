@@ -0,0 +1,97 @@
+"""
+预览图编码与渐进式预览
+按浏览器的显示尺寸缩小二值图后再编码，直接返回图片字节；
+快速预览在缩小的图像上计算，完整预览在新请求到达后自动作废
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from metrics import timed
+
+# 预览图格式：(扩展名, MIME 类型)
+PREVIEW_FORMATS = {
+    'png': ('.png', 'image/png'),
+    'webp': ('.webp', 'image/webp'),
+}
+# 快速预览使用的图像宽度
+FAST_PREVIEW_WIDTH = 480
+# 最多记录的客户端数，超出时淘汰最久未活动的
+PREVIEW_MAX_CLIENTS = 1024
+
+
+class PreviewSuperseded(Exception):
+    """同一客户端已发出更新的预览请求，本次结果不再需要"""
+
+
+class PreviewTracker:
+    """记录每个客户端最新的预览请求序号，用于作废过期的完整预览"""
+
+    def __init__(self, max_clients=PREVIEW_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, client_id, seq):
+        """登记请求，序号比已登记的旧时说明请求本身已过期
+
+        同一次参数更新的快速预览与完整预览共用序号，互不作废。
+        """
+        with self._lock:
+            if seq < self._latest.get(client_id, -1):
+                return False
+            self._latest[client_id] = seq
+            self._latest.move_to_end(client_id)
+            while len(self._latest) > self.max_clients:
+                self._latest.popitem(last=False)
+            return True
+
+    def checker(self, client_id, seq):
+        """返回供流水线在阶段之间调用的检查函数，过期时抛出 PreviewSuperseded"""
+        def check():
+            with self._lock:
+                if self._latest.get(client_id, -1) > seq:
+                    raise PreviewSuperseded(client_id)
+        return check
+
+
+def fit_size(width, height, max_width=0, max_height=0):
+    """按最大宽高等比缩小，返回 (宽, 高)；最大值为 0 表示不限制，不会放大"""
+    scale = 1.0
+    if max_width > 0:
+        scale = min(scale, max_width / width)
+    if max_height > 0:
+        scale = min(scale, max_height / height)
+    if scale >= 1.0:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def encode_preview(binary, max_width=0, max_height=0, fmt='png'):
+    """把二值图缩小到显示尺寸以内并编码，返回 (字节, MIME 类型)
+
+    未缩小时图像只有 0/255 两种值，PNG 以 1 位深度 + RLE 编码，速度最快；
+    缩小后 INTER_AREA 产生灰度过渡，使用低压缩级别的 RLE PNG。
+    webp 为无损编码，体积最小但编码较慢，适合慢速网络。
+    """
+    ext, mimetype = PREVIEW_FORMATS[fmt]
+    h, w = binary.shape[:2]
+    size = fit_size(w, h, max_width, max_height)
+    scaled = size != (w, h)
+    if scaled:
+        with timed('preview_resize'):
+            binary = cv2.resize(binary, size, interpolation=cv2.INTER_AREA)
+
+    if fmt == 'webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+    else:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE]
+        if not scaled:
+            params += [cv2.IMWRITE_PNG_BILEVEL, 1]
+    with timed('preview_encode'):
+        ok, buffer = cv2.imencode(ext, binary, params)
+    if not ok:
+        raise ValueError("预览图编码失败")
+    return buffer.tobytes(), mimetype
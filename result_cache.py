@@ -0,0 +1,225 @@
+"""
+转换结果的磁盘缓存
+按 (图像内容哈希, 规范化的转换参数) 保存生成的输出文件，相同图片与参数的重复转换直接返回缓存文件。
+写入先落到缓存目录中的临时文件再原子重命名，读者不会看到写了一半的文件；
+总大小超出预算时按最近使用时间淘汰，使用时间记录在文件的 mtime 中，重启后仍然有效
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pipeline
+from thinning import resolve_backend
+from vectorize import LEVEL_LAYER_COLORS, OUTPUT_LAYER, canonical_params
+
+logger = logging.getLogger(__name__)
+
+# 磁盘缓存的大小上限（字节），0 表示不缓存
+RESULT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# 输出格式或矢量化实现变化导致旧结果失效时递增
+RESULT_CACHE_VERSION = 3
+# 启动扫描时只删除早于此时长（秒）的临时文件与无元数据的条目：任务进程（spawn）导入 main 时也会扫描，
+# 不能删掉服务进程正在写入的文件
+STALE_SECONDS = 3600
+
+_META_SUFFIX = '.json'
+_TEMP_SUFFIX = '.tmp'
+
+
+def result_key(image_id, params):
+    """结果缓存键：图像哈希、规范化参数与影响输出的模块配置的 SHA-256"""
+    settings = {
+        'version': RESULT_CACHE_VERSION,
+        'max_width': pipeline.MAX_WIDTH,
+        'border': pipeline.BORDER_SIZE,
+        'layer': OUTPUT_LAYER,
+        'layer_colors': LEVEL_LAYER_COLORS,
+    }
+    if params['single_line']:
+        settings['thinning'] = resolve_backend(pipeline.THINNING_BACKEND)
+    payload = json.dumps([image_id, canonical_params(params), settings], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """内容寻址的输出文件缓存：每个条目为数据文件 <键> 与元数据 <键>.json
+
+    元数据（统计信息）在数据文件之后写入，存在元数据即表示条目完整；
+    启动时扫描目录重建索引，并删除过期的不完整条目与残留的临时文件。
+    写入失败（如 Windows 上目标文件仍被打开时 os.replace 抛出 PermissionError）时清理已写的文件并抛出 OSError，
+    调用方只需放弃缓存，不影响本次响应。
+    """
+
+    def __init__(self, folder, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        # 键 → 条目字节数（数据 + 元数据），按最近使用排序
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def _data_path(self, key):
+        return os.path.join(self.folder, key)
+
+    def _load(self):
+        entries = []
+        names = set(os.listdir(self.folder))
+        stale_before = time.time() - STALE_SECONDS
+        for name in names:
+            path = os.path.join(self.folder, name)
+            if name.endswith(_META_SUFFIX):
+                # 元数据对应的数据文件已不存在
+                if name[:-len(_META_SUFFIX)] not in names:
+                    self._unlink(path)
+                continue
+            if name.endswith(_TEMP_SUFFIX) or name + _META_SUFFIX not in names:
+                # 残留的临时文件，或写入元数据之前中断的条目；较新的可能仍在写入中
+                try:
+                    if os.path.getmtime(path) < stale_before:
+                        self._unlink(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                stat = os.stat(path)
+                size = stat.st_size + os.path.getsize(path + _META_SUFFIX)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, size))
+        for _, key, size in sorted(entries):
+            self._items[key] = size
+            self.current_bytes += size
+        with self._lock:
+            self._evict()
+        if entries:
+            logger.info("结果缓存：%d 个条目，%.1f MB", len(self._items), self.current_bytes / 1e6)
+
+    def temp_path(self):
+        """在缓存目录中创建临时文件，写完后交给 put(move=True)，与缓存文件在同一文件系统上可原子重命名"""
+        fd, path = tempfile.mkstemp(dir=self.folder, suffix=_TEMP_SUFFIX)
+        os.close(fd)
+        return path
+
+    def get(self, key):
+        """命中时返回 (打开的数据文件, 元数据) 并刷新使用时间，否则返回 None
+
+        返回已打开的文件：之后条目被淘汰、文件被删除时，发送中的响应不受影响（POSIX）。
+        """
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+        path = self._data_path(key)
+        try:
+            with open(path + _META_SUFFIX, encoding='utf-8') as f:
+                meta = json.load(f)
+            os.utime(path)
+            file = open(path, 'rb')
+        except (OSError, ValueError):
+            # 文件在外部被删除或损坏
+            self.pop(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return file, meta
+
+    def put(self, key, src_path, meta, move=False):
+        """保存结果文件，返回缓存中的数据文件路径
+
+        move 为真时把 src_path（temp_path 创建的临时文件）重命名进缓存；否则以硬链接加入，
+        不支持硬链接时复制，源文件保持不变。失败时抛出 OSError，不留下不完整的条目；
+        move 的源文件此时也尽量删除（仍被打开而删不掉的留给启动扫描）。
+        """
+        path = self._data_path(key)
+        tmp = None
+        try:
+            if move:
+                os.replace(src_path, path)
+            else:
+                tmp = self.temp_path()
+                os.remove(tmp)
+                try:
+                    os.link(src_path, tmp)
+                except OSError:
+                    shutil.copyfile(src_path, tmp)
+                os.replace(tmp, path)
+            tmp = self.temp_path()
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp, path + _META_SUFFIX)
+            tmp = None
+            size = os.path.getsize(path) + os.path.getsize(path + _META_SUFFIX)
+        except OSError:
+            # 数据文件可能已就位但没有元数据：连同旧条目一起作废，之后的请求按未命中处理
+            self.pop(key)
+            self._remove(key)
+            for leftover in (tmp, src_path if move else None):
+                if leftover is not None:
+                    self._unlink(leftover)
+            raise
+
+        with self._lock:
+            self.current_bytes += size - self._items.pop(key, 0)
+            self._items[key] = size
+            self._evict()
+        return path
+
+    def link_to(self, key, dst):
+        """把缓存文件以硬链接（不支持时复制）放到 dst，之后淘汰缓存条目不影响 dst；条目不存在时返回 False"""
+        path = self._data_path(key)
+        try:
+            try:
+                os.link(path, dst)
+            except OSError:
+                shutil.copyfile(path, dst)
+        except OSError:
+            self.pop(key)
+            return False
+        return True
+
+    def pop(self, key):
+        with self._lock:
+            size = self._items.pop(key, None)
+            if size is not None:
+                self.current_bytes -= size
+        if size is not None:
+            self._remove(key)
+
+    def _evict(self):
+        # 调用时已持有锁
+        while self.current_bytes > self.max_bytes and self._items:
+            key, size = self._items.popitem(last=False)
+            self.current_bytes -= size
+            self._remove(key)
+
+    def _remove(self, key):
+        # 先删元数据，条目立即视为不存在；数据文件删不掉（Windows 上仍被打开）时成为孤立文件，
+        # 之后对同一键的 put 若无法覆盖它会放弃缓存，启动扫描时再清理
+        path = self._data_path(key)
+        self._unlink(path + _META_SUFFIX)
+        self._unlink(path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,133 @@
+"""
+生产模式的 HTTP 服务
+固定大小的线程池处理连接，不再像 threaded=True 那样每个连接新建线程；
+等待处理的连接超过上限时直接返回 503，不读取请求体。
+重型请求另由 admission 模块按内存预算限流
+"""
+
+import functools
+import io
+import logging
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from admission import ADMISSION_RETRY_AFTER
+
+logger = logging.getLogger(__name__)
+
+# 处理请求的线程数：多于重型请求的并发上限，轮询进度、预览等轻量请求不被阻塞
+SERVE_THREADS = 16
+# 线程全忙时最多排队的连接数，超过后直接返回 503
+SERVE_BACKLOG = 64
+# 磁盘文件响应（send_file 传入路径）用 socket.sendfile 由内核直接从页缓存发送
+SERVE_SENDFILE = True
+
+_REJECT_RESPONSE = (
+    'HTTP/1.0 503 Service Unavailable\r\n'
+    f'Retry-After: {ADMISSION_RETRY_AFTER}\r\n'
+    'Content-Type: text/plain; charset=utf-8\r\n'
+    'Content-Length: 0\r\n'
+    'Connection: close\r\n\r\n'
+).encode('ascii')
+
+
+def _is_regular_file(file):
+    if type(file) is not io.BufferedReader:
+        return False
+    try:
+        return stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
+class _SendfileWrapper:
+    """wsgi.file_wrapper：普通磁盘文件不经过用户态缓冲区，响应头发出后由 socket.sendfile 发送文件内容
+
+    内存中的文件（溢出式临时文件等）仍按块读取后写出。
+    """
+
+    def __init__(self, handler, file, block_size=8192):
+        self.handler = handler
+        self.file = file
+        self.block_size = block_size
+
+    def __iter__(self):
+        if not _is_regular_file(self.file):
+            yield from iter(lambda: self.file.read(self.block_size), b'')
+            return
+        # 先交出空块，服务器在写出第一块时发送状态行与响应头
+        yield b''
+        self.handler.wfile.flush()
+        self.handler.connection.sendfile(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # 每个请求后关闭连接：空闲的长连接会一直占用线程池中的线程
+    protocol_version = 'HTTP/1.0'
+
+    def make_environ(self):
+        environ = super().make_environ()
+        # Range 请求由 werkzeug 截取文件片段，不能整个文件直接发送
+        if SERVE_SENDFILE and 'HTTP_RANGE' not in environ:
+            environ['wsgi.file_wrapper'] = functools.partial(_SendfileWrapper, self)
+        return environ
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """固定线程池的 WSGI 服务器"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=SERVE_THREADS, backlog=SERVE_BACKLOG):
+        super().__init__(host, port, app, handler=_RequestHandler)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+        # 正在处理与排队的连接总数上限
+        self._slots = threading.BoundedSemaphore(threads + backlog)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._reject(request)
+            return
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def _reject(self, request):
+        logger.warning("连接过多，拒绝新连接")
+        try:
+            request.sendall(_REJECT_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        executor = getattr(self, 'executor', None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def serve(app, host, port, threads=SERVE_THREADS, backlog=SERVE_BACKLOG):
+    """以生产模式运行 app，直到进程被终止"""
+    server = PooledWSGIServer(host, port, app, threads=threads, backlog=backlog)
+    logger.info("生产模式：http://%s:%d，%d 个处理线程，最多排队 %d 个连接", host, port, threads, backlog)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,336 @@
+"""
+曲线边缘模式的样条拟合
+对每条轮廓拟合经过全部顶点的三次均匀 B 样条（闭合轮廓为周期样条，开放笔画两端为自然边界），
+再按弦高误差自适应采样：直线段只保留原顶点，弯曲处按曲率加密。
+多条轮廓拼接为一个分块对角的稀疏方程组一次求解，采样也对所有曲线段整体向量化
+"""
+
+import numpy as np
+
+from startup import load
+
+# 一批拟合的最大顶点数，限制稀疏矩阵与临时数组的大小
+SPLINE_BATCH_POINTS = 1 << 16
+# 每个曲线段的最大采样数
+MAX_SEGMENT_SAMPLES = 64
+# 一段圆弧最多覆盖的采样点数
+MAX_ARC_SAMPLES = 256
+
+# 均匀三次 B 样条段的幂基矩阵：P(t) = [1, t, t², t³] · _POWER_BASIS · [c0, c1, c2, c3]
+_POWER_BASIS = np.array([[1, 4, 1, 0],
+                         [-3, 0, 3, 0],
+                         [3, -6, 3, 0],
+                         [-1, 3, -3, 1]], dtype=np.float64) / 6
+
+
+class SplineBatch:
+    """一批轮廓的拟合结果
+
+    controls 为所有轮廓的控制点按顺序拼接，starts/lengths 为每条轮廓在其中的位置，
+    数量与原顶点数相同：闭合轮廓按周期延拓，开放笔画两端的虚拟控制点由自然边界条件给出。
+    """
+
+    def __init__(self, controls, starts, lengths, closed):
+        self.controls = controls
+        self.starts = starts
+        self.lengths = lengths
+        self.closed = closed
+
+    def segment_controls(self):
+        """返回 (每条轮廓的曲线段数, (S, 4, 2) 每段的 4 个控制点)"""
+        seg_counts = np.where(self.closed, self.lengths, self.lengths - 1)
+        contour = np.repeat(np.arange(len(self.lengths)), seg_counts)
+        local = np.arange(seg_counts.sum()) - np.repeat(np.cumsum(seg_counts) - seg_counts, seg_counts)
+        start = self.starts[contour]
+        n = self.lengths[contour]
+        closed = self.closed[contour]
+        c = self.controls
+
+        quad = np.empty((len(local), 4, 2))
+        for d in range(4):
+            i = local + d - 1
+            # 闭合轮廓周期取下标，开放笔画先截断到端点，越界的再用虚拟控制点替换
+            idx = start + np.where(closed, i % n, np.clip(i, 0, n - 1))
+            quad[:, d] = c[idx]
+        head = ~closed & (local == 0)
+        quad[head, 0] = 2 * c[start[head]] - c[start[head] + 1]
+        tail = ~closed & (local == n - 2)
+        last = start[tail] + n[tail] - 1
+        quad[tail, 3] = 2 * c[last] - c[last - 1]
+        return seg_counts, quad
+
+    def contour_controls(self):
+        """返回每条轮廓的完整控制点序列，配合 clamped_knots 即为 DXF SPLINE 的定义
+
+        闭合轮廓在末尾重复开头的控制点，开放笔画两端补上虚拟控制点，得到均匀节点的非周期样条；
+        再换算为两端节点重复 4 次的夹持样条，曲线从首个控制点开始、在末个控制点结束。
+        非夹持的均匀节点只有定义域 [3, n] 上才是所拟合的曲线，CAD 软件与 ezdxf.path
+        对定义域外的处理各不相同，夹持后各处绘制结果一致。
+        """
+        results = []
+        for start, n, closed in zip(self.starts, self.lengths, self.closed):
+            c = self.controls[start:start + n]
+            if closed:
+                results.append(clamp_uniform(c[(np.arange(n + 3) - 1) % n]))
+            else:
+                results.append(clamp_uniform(np.vstack([2 * c[0] - c[1], c, 2 * c[-1] - c[-2]])))
+        return results
+
+
+def clamp_uniform(controls):
+    """均匀三次 B 样条（至少 5 个控制点）→ 同一曲线的夹持样条控制点，数量不变
+
+    两端各插入节点至重数 4，只有前后各两个控制点改变：
+    Q0 = (P0 + 4P1 + P2) / 6，Q1 = (2P1 + P2) / 3，末端对称，其余 Q = P。
+    """
+    c = np.asarray(controls, dtype=np.float64)
+    q = c.copy()
+    q[0] = (c[0] + 4 * c[1] + c[2]) / 6
+    q[1] = (2 * c[1] + c[2]) / 3
+    q[-2] = (2 * c[-2] + c[-3]) / 3
+    q[-1] = (c[-1] + 4 * c[-2] + c[-3]) / 6
+    return q
+
+
+def unclamp_uniform(controls):
+    """clamp_uniform 的逆变换：夹持样条控制点 → 均匀三次 B 样条控制点"""
+    q = np.asarray(controls, dtype=np.float64)
+    c = q.copy()
+    c[1] = (3 * q[1] - q[2]) / 2
+    c[0] = 6 * q[0] - 4 * c[1] - q[2]
+    c[-2] = (3 * q[-2] - q[-3]) / 2
+    c[-1] = 6 * q[-1] - 4 * c[-2] - q[-3]
+    return c
+
+
+def clamped_knots(count):
+    """三次夹持 B 样条的节点向量（两端重数 4，内部等距），count 为控制点数"""
+    segments = count - 3
+    return np.concatenate([np.zeros(3), np.arange(segments + 1, dtype=np.float64), np.full(3, float(segments))])
+
+
+def fit_batch(polylines):
+    """拟合一批 (points, closed) 折线，每条至少 3 个点，返回 SplineBatch
+
+    插值条件 (c[i-1] + 4c[i] + c[i+1]) / 6 = p[i]；开放笔画的自然边界条件使端点处 c = p。
+    """
+    splu = load('scipy.sparse.linalg').splu
+    sparse = load('scipy.sparse')
+
+    lengths = np.array([len(points) for points, _ in polylines])
+    closed = np.array([bool(c) for _, c in polylines])
+    starts = np.cumsum(lengths) - lengths
+    points = np.concatenate([points for points, _ in polylines]).astype(np.float64)
+
+    total = len(points)
+    contour = np.repeat(np.arange(len(lengths)), lengths)
+    local = np.arange(total) - starts[contour]
+    n = lengths[contour]
+    start = starts[contour]
+    is_closed = closed[contour]
+    end = ~is_closed & ((local == 0) | (local == n - 1))
+
+    rows = np.arange(total)
+    prev = start + (local - 1) % n
+    nxt = start + (local + 1) % n
+    side = np.where(end, 0.0, 1 / 6)
+    matrix = sparse.csc_matrix(
+        (np.concatenate([np.where(end, 1.0, 4 / 6), side, side]),
+         (np.concatenate([rows, rows, rows]), np.concatenate([rows, prev, nxt]))),
+        shape=(total, total))
+    # 按原顺序分解：每块只有循环角上的两个元素会产生填充
+    controls = splu(matrix, permc_spec='NATURAL').solve(points)
+    return SplineBatch(controls, starts, lengths, closed)
+
+
+def iter_batches(polylines):
+    """按 SPLINE_BATCH_POINTS 分批拟合，依次产出 (批内折线的下标, SplineBatch)"""
+    batch = []
+    size = 0
+    for i, (points, _) in enumerate(polylines):
+        batch.append(i)
+        size += len(points)
+        if size >= SPLINE_BATCH_POINTS:
+            yield batch, fit_batch([polylines[j] for j in batch])
+            batch, size = [], 0
+    if batch:
+        yield batch, fit_batch([polylines[j] for j in batch])
+
+
+def sample_batch(batch, tolerance):
+    """按弦高误差不超过 tolerance（像素）自适应采样，返回每条轮廓的 (N, 2) 点数组
+
+    三次段上 |P''| 在两端取最大值，分成 k 份时弦高误差不超过 max|P''| / (8k²)。
+    每段从 t = 0（即原顶点）开始采样，开放笔画最后补上终点。
+    """
+    seg_counts, quad = batch.segment_controls()
+    c0, c1, c2, c3 = quad[:, 0], quad[:, 1], quad[:, 2], quad[:, 3]
+    curvature = np.maximum(np.hypot(*(c0 - 2 * c1 + c2).T), np.hypot(*(c1 - 2 * c2 + c3).T))
+    k = np.ceil(np.sqrt(curvature / (8 * tolerance))).astype(np.int64)
+    np.clip(k, 1, MAX_SEGMENT_SAMPLES, out=k)
+
+    seg = np.repeat(np.arange(len(k)), k)
+    t = (np.arange(k.sum()) - np.repeat(np.cumsum(k) - k, k)) / k[seg]
+    t = t[:, None]
+    # 每段先换算为多项式系数，采样点按 Horner 法求值
+    coef = (_POWER_BASIS @ quad)[seg]
+    samples = ((coef[:, 3] * t + coef[:, 2]) * t + coef[:, 1]) * t + coef[:, 0]
+
+    per_contour = np.add.reduceat(k, np.cumsum(seg_counts) - seg_counts)
+    results = np.split(samples, np.cumsum(per_contour)[:-1])
+    for i, closed in enumerate(batch.closed):
+        if not closed:
+            last = batch.starts[i] + batch.lengths[i] - 1
+            # 自然边界下终点的控制点就是原终点
+            results[i] = np.vstack([results[i], batch.controls[last:last + 1]])
+    return results
+
+
+def _fitted(polylines, fit_func):
+    """对至少 3 个点的折线分批调用 fit_func(batch)，返回与输入一一对应的结果，其余为 None"""
+    results = [None] * len(polylines)
+    fit = [i for i, (points, _) in enumerate(polylines) if len(points) >= 3]
+    for indices, batch in iter_batches([polylines[i] for i in fit]):
+        for j, value in zip(indices, fit_func(batch)):
+            results[fit[j]] = value
+    return results
+
+
+def smooth_polylines(polylines, tolerance):
+    """拟合并自适应采样所有 (points, closed) 折线，返回与输入一一对应的点数组
+
+    少于 3 个点的折线原样返回。
+    """
+    samples = _fitted(polylines, lambda batch: sample_batch(batch, tolerance))
+    return [points if s is None else s for s, (points, _) in zip(samples, polylines)]
+
+
+def spline_polylines(polylines):
+    """拟合所有 (points, closed) 折线，返回每条的 SPLINE 控制点，少于 3 个点的原样返回"""
+    controls = _fitted(polylines, SplineBatch.contour_controls)
+    return [points if c is None else c for c, (points, _) in zip(controls, polylines)]
+
+
+def _arc_fits(points, starts, spans, tolerance):
+    """检验每个 points[start : start + span + 1] 能否用一段圆弧（或直线）表示
+
+    返回 (是否可以, 凸度)。圆弧取过首点、中点、尾点的圆，所有点到圆的距离加上相邻点之间圆弧的
+    拱高不超过 tolerance（采样点之间的圆弧离采样折线也不超过 tolerance），沿弦方向不折返，
+    且不超过半圆；凸度 = tan(圆心角 / 4)，逆时针为正。
+    """
+    ends = starts + spans
+    width = spans.max() + 1
+    # 窗口不足 width 的部分用尾点填充，尾点在圆上，不影响偏差
+    idx = np.minimum(starts[:, None] + np.arange(width), ends[:, None])
+    a = points[starts]
+    rel = points[idx] - a[:, None]
+    chord = points[ends] - a
+    am = points[starts + spans // 2] - a
+    ab2 = np.einsum('ij,ij->i', chord, chord)
+    am2 = np.einsum('ij,ij->i', am, am)
+    length = np.sqrt(ab2)
+    side = chord[:, 0] * am[:, 1] - chord[:, 1] * am[:, 0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 各点到弦所在直线的距离，以及在弦方向上的投影
+        offsets = (chord[:, None, 0] * rel[..., 1] - chord[:, None, 1] * rel[..., 0]) / length[:, None]
+        straight = np.abs(offsets).max(axis=1) <= tolerance
+        # 不超过半圆时，沿弧前进的点在弦上的投影单调递增；折返（尖点）的窗口不能合并
+        along = (chord[:, None, 0] * rel[..., 0] + chord[:, None, 1] * rel[..., 1]) / length[:, None]
+        forward = np.diff(along, axis=1).min(axis=1) >= -tolerance
+        # 外接圆圆心（相对首点）
+        center = np.column_stack([am[:, 1] * ab2 - chord[:, 1] * am2,
+                                  chord[:, 0] * am2 - am[:, 0] * ab2]) / (2 * side)[:, None]
+        radius = np.hypot(center[:, 0], center[:, 1])
+        deviation = np.abs(np.hypot(rel[..., 0] - center[:, None, 0], rel[..., 1] - center[:, None, 1])
+                           - radius[:, None]).max(axis=1)
+        # 相邻采样点之间的最大间距所对应的圆弧拱高
+        gap = np.hypot(*np.diff(rel, axis=1).transpose(2, 0, 1)).max(axis=1)
+        gap_sagitta = radius - np.sqrt(np.maximum(radius * radius - gap * gap / 4, 0.0))
+        # 圆心与圆弧在弦的同侧时为优弧
+        center_side = chord[:, 0] * center[:, 1] - chord[:, 1] * center[:, 0]
+        arc = (side != 0) & (deviation + gap_sagitta <= tolerance) & (center_side * side < 0)
+        sagitta = radius - np.sqrt(np.maximum(radius * radius - ab2 / 4, 0.0))
+        bulge = np.where(arc & ~straight, np.copysign(2 * sagitta / length, -side), 0.0)
+    ok = (length > 0) & forward & (straight | arc)
+    return ok, bulge
+
+
+def _arc_reach(points, limits, tolerance):
+    """对每个点求从它出发、偏差不超过 tolerance 的最长圆弧终点，返回 (终点下标, 凸度)
+
+    先把跨度倍增到失败为止，再在最后一次成功与失败之间二分。
+    """
+    n = len(points)
+    starts = np.arange(n)
+    good = np.minimum(limits, 1)
+    bulge = np.zeros(n)
+    bad = limits + 1
+
+    span = 2
+    active = starts[limits >= 2]
+    while len(active):
+        spans = np.minimum(span, limits[active])
+        ok, b = _arc_fits(points, active, spans, tolerance)
+        good[active[ok]] = spans[ok]
+        bulge[active[ok]] = b[ok]
+        bad[active[~ok]] = spans[~ok]
+        active = active[ok & (spans < limits[active])]
+        span *= 2
+
+    while True:
+        active = starts[bad - good > 1]
+        if not len(active):
+            break
+        spans = (good[active] + bad[active]) // 2
+        ok, b = _arc_fits(points, active, spans, tolerance)
+        good[active[ok]] = spans[ok]
+        bulge[active[ok]] = b[ok]
+        bad[active[~ok]] = spans[~ok]
+    return starts + good, bulge
+
+
+def fit_arcs(samples, closed, tolerance):
+    """把每条密集采样折线贪心合并为圆弧，返回 (N, 3) 的 (x, y, 凸度)，即 LWPOLYLINE 的 xyb 格式
+
+    所有折线拼接后一起计算每个点出发的最长圆弧，再沿折线逐段跳跃。
+    """
+    paths = [np.vstack([points, points[:1]]) if c else points for points, c in zip(samples, closed)]
+    lengths = np.array([len(points) for points in paths])
+    ends = np.cumsum(lengths)
+    points = np.concatenate(paths)
+    # 圆弧不跨越折线，也不超过 MAX_ARC_SAMPLES 个采样点
+    limits = np.minimum(np.repeat(ends - 1, lengths) - np.arange(len(points)), MAX_ARC_SAMPLES)
+    reach, bulge = _arc_reach(points, limits, tolerance)
+
+    reach = reach.tolist()
+    results = []
+    for start, end, c in zip((ends - lengths).tolist(), ends.tolist(), closed):
+        chain = []
+        i = start
+        while i < end - 1:
+            chain.append(i)
+            i = reach[i]
+        if not c:
+            chain.append(end - 1)
+        chain = np.array(chain, dtype=np.int64)
+        xyb = np.column_stack([points[chain], bulge[chain]])
+        if not c:
+            xyb[-1, 2] = 0.0
+        results.append(xyb)
+    return results
+
+
+def arc_polylines(polylines, tolerance):
+    """拟合样条后再合并为圆弧，返回每条折线的 (N, 3) xyb 数组，少于 3 个点的原样返回
+
+    采样与圆弧合并各自的偏差不超过 tolerance，相对样条的总偏差不超过 2 * tolerance。
+    """
+    results = [points for points, _ in polylines]
+    fit = [i for i, (points, _) in enumerate(polylines) if len(points) >= 3]
+    if fit:
+        samples = smooth_polylines([polylines[i] for i in fit], tolerance)
+        arcs = fit_arcs(samples, [polylines[i][1] for i in fit], tolerance)
+        for i, xyb in zip(fit, arcs):
+            results[i] = xyb
+    return results
@@ -0,0 +1,102 @@
+"""
+启动策略与依赖导入计时
+  warm - 启动时导入全部依赖，并用一张小图把各条转换路径走一遍，之后才开始接受请求
+  lazy - ezdxf、scipy、scikit-image 推迟到第一次使用时导入，启动最快
+两种策略都记录每个模块首次导入的实际耗时，写入日志并在 /metrics 中输出
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+
+from metrics import add_time
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODES = ('warm', 'lazy')
+# 所有请求都需要的核心依赖，在 main 的模块级导入
+CORE_MODULES = ('numpy', 'cv2', 'flask')
+# 只有部分功能使用的依赖：warm 时启动阶段导入，lazy 时第一次使用时导入。
+# 凡是经 load() 导入的模块都要列在这里，build.py 据此传给 PyInstaller 的 --hidden-import
+DEFERRED_MODULES = ('ezdxf', 'ezdxf.path', 'ezdxf.bbox', 'scipy.sparse', 'scipy.sparse.linalg', 'skimage.morphology')
+
+# 模块名 → 首次导入耗时（秒）
+import_seconds = {}
+_import_lock = threading.Lock()
+
+
+def load(name):
+    """导入模块并记录首次导入耗时，已导入的模块直接返回
+
+    在请求中首次导入时，耗时同时计入该请求的 import 阶段（Server-Timing 中可见）。
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _import_lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        seconds = time.perf_counter() - start
+        if name in import_seconds:
+            return module
+        import_seconds[name] = seconds
+    logger.info("导入 %s：%.0f ms", name, seconds * 1000)
+    add_time('import', seconds)
+    return module
+
+
+def load_all(names):
+    for name in names:
+        load(name)
+
+
+def _warm_up_image():
+    """64x64 的小图：圆、折线和实心块，覆盖轮廓、孔洞和骨架分支"""
+    import numpy as np
+    import cv2
+    img = np.full((64, 64, 3), 255, np.uint8)
+    cv2.circle(img, (22, 22), 14, (0, 0, 0), 3)
+    cv2.polylines(img, [np.array([[8, 56], [32, 40], [56, 56]], np.int32)], False, (0, 0, 0), 2)
+    cv2.rectangle(img, (44, 8), (58, 30), (0, 0, 0), -1)
+    return img
+
+
+# 预热转换的参数组合：填充 + 样条、单线条 + 插值 + 简化
+WARM_UP_FORMS = (
+    {'fill_color': 'black', 'high_precision': 'curve_edge'},
+    {'single_line': 'true', 'high_precision': 'more_points_8', 'simplify': '0.5'},
+)
+
+
+def warm_up():
+    """导入全部依赖并执行一次小图转换，首个请求不再承担导入与初始化开销"""
+    import io
+    from pipeline import stage_cache
+    from vectorize import convert, parse_convert_params
+
+    for name in DEFERRED_MODULES:
+        try:
+            load(name)
+        except ImportError:
+            logger.info("未安装 %s，相关功能使用后备实现", name)
+
+    img = _warm_up_image()
+    for form in WARM_UP_FORMS:
+        doc, _ = convert('warm-up', img, parse_convert_params(form))
+        doc.write(io.StringIO())
+    # 预热图的各阶段结果不再需要
+    stage_cache.clear()
+
+
+def prepare(mode):
+    """按启动策略准备服务，在开始接受请求之前调用"""
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"未知的启动策略：{mode}")
+    start = time.perf_counter()
+    if mode == 'warm':
+        warm_up()
+    summary = ', '.join(f'{name}={seconds * 1000:.0f}ms' for name, seconds in import_seconds.items())
+    logger.info("启动策略 %s，准备耗时 %.0f ms；模块导入耗时：%s",
+                mode, (time.perf_counter() - start) * 1000, summary)
@@ -0,0 +1,203 @@
+"""
+SVG 输出
+把矢量化生成的 DXF 模型空间逐个实体写成 SVG 路径，边生成边写入文本流。
+图纸坐标即图像像素坐标（y 轴向下），与 SVG 一致，无需翻转：
+  LWPOLYLINE - 直线段，带凸度的段写为圆弧（A 命令）
+  SPLINE     - 均匀（含两端夹持的）三次 B 样条逐段转换为三次贝塞尔（C 命令），与原曲线完全一致
+  HATCH      - 所有边界合成一条 evenodd 填充路径
+其他实体由 ezdxf.path 展平为折线
+"""
+
+import numpy as np
+
+from splines import unclamp_uniform
+from startup import load
+
+# 坐标保留的小数位数（像素）
+SVG_DECIMALS = 3
+# 非均匀样条等通用实体展平为折线时的弦高误差（像素）
+SVG_FLATTEN_TOLERANCE = 0.05
+# 线条颜色与宽度（像素）
+SVG_STROKE = '#000'
+SVG_STROKE_WIDTH = 1
+
+
+def _numbers(values):
+    """坐标数组 → 数值列表；全为整数时输出整数，省去 '.0'"""
+    values = np.round(np.asarray(values, dtype=np.float64), SVG_DECIMALS)
+    if np.array_equal(values, np.trunc(values)):
+        return values.astype(np.int64).ravel().tolist()
+    return values.ravel().tolist()
+
+
+def _join(values):
+    return ' '.join(map(str, values))
+
+
+def _polyline_data(points, closed):
+    """(N, 2) 折线 → 路径数据；M 之后的坐标对按 SVG 规则隐含为 L"""
+    data = 'M' + _join(_numbers(points))
+    return data + 'Z' if closed else data
+
+
+def _bulge_data(xyb, closed):
+    """(N, 3) 的 (x, y, 凸度) 顶点 → 路径数据，凸度非 0 的段写为圆弧
+
+    凸度 b = tan(θ/4)，θ 为圆心角；半径 = 弦长 / (2 sin(θ/2))。
+    DXF 中正凸度为逆时针，即角度增加的方向，在同一坐标系下对应 SVG 的 sweep-flag=1。
+    """
+    xyb = np.asarray(xyb, dtype=np.float64)
+    if not xyb[:, 2].any():
+        return _polyline_data(xyb[:, :2], closed)
+    points = xyb[:, :2]
+    bulges = xyb[:, 2] if closed else xyb[:-1, 2]
+    ends = np.roll(points, -1, axis=0)[:len(bulges)]
+    chords = np.hypot(*(ends - points[:len(bulges)]).T)
+    angles = 4 * np.arctan(np.abs(bulges))
+    # 直线段（凸度为 0）不需要半径
+    radii = chords / np.where(angles > 0, 2 * np.sin(angles / 2), 1)
+    coords = _numbers(ends)
+    radii = _numbers(radii)
+    parts = ['M' + _join(_numbers(points[0]))]
+    for i, b in enumerate(bulges.tolist()):
+        x, y = coords[2 * i], coords[2 * i + 1]
+        if b == 0:
+            parts.append(f'L{x} {y}')
+        else:
+            large = 1 if abs(b) > 1 else 0
+            sweep = 1 if b > 0 else 0
+            parts.append(f'A{radii[i]} {radii[i]} 0 {large} {sweep} {x} {y}')
+    if closed:
+        parts.append('Z')
+    return ''.join(parts)
+
+
+def _lwpolyline_xyb(entity):
+    """LWPOLYLINE 的 (N, 3) 顶点数组
+
+    直接读取 ezdxf 内部按 (x, y, 起始宽度, 终止宽度, 凸度) 打包的顶点数据；
+    get_points 逐个顶点生成元组，大图上占 SVG 输出耗时的大部分。
+    """
+    values = np.asarray(entity.lwpoints.values, dtype=np.float64).reshape(-1, 5)
+    return values[:, [0, 1, 4]]
+
+
+def _is_uniform_cubic(degree, knots):
+    knots = np.asarray(knots, dtype=np.float64)
+    return degree == 3 and len(knots) > 1 and np.allclose(np.diff(knots), knots[1] - knots[0])
+
+
+def _is_clamped_uniform_cubic(degree, knots):
+    """两端节点重数 4、内部等距的三次样条（splines.clamped_knots）"""
+    knots = np.asarray(knots, dtype=np.float64)
+    if degree != 3 or len(knots) < 9:
+        return False
+    inner = np.diff(knots[3:-3])
+    return (np.all(knots[:4] == knots[0]) and np.all(knots[-4:] == knots[-1])
+            and inner[0] > 0 and np.allclose(inner, inner[0]))
+
+
+def _bezier_data(controls):
+    """均匀三次 B 样条的控制点 → 逐段三次贝塞尔的路径数据
+
+    段 j 由控制点 P(j..j+3) 决定，贝塞尔控制点为
+    (P0+4P1+P2)/6, (2P1+P2)/3, (P1+2P2)/3, (P1+4P2+P3)/6，相邻段首尾相接。
+    """
+    c = np.asarray(controls, dtype=np.float64)[:, :2]
+    p1, p2, p3 = c[1:-2], c[2:-1], c[3:]
+    start = (c[0] + 4 * c[1] + c[2]) / 6
+    segments = np.stack([(2 * p1 + p2) / 3, (p1 + 2 * p2) / 3, (p1 + 4 * p2 + p3) / 6], axis=1)
+    return 'M' + _join(_numbers(start)) + 'C' + _join(_numbers(segments))
+
+
+def _spline_data(controls, knots, degree, closed=False):
+    if len(controls) >= 4 and _is_uniform_cubic(degree, knots):
+        data = _bezier_data(controls)
+    elif len(controls) >= 5 and _is_clamped_uniform_cubic(degree, knots):
+        data = _bezier_data(unclamp_uniform(np.asarray(controls, dtype=np.float64)[:, :2]))
+    else:
+        return None
+    return data + 'Z' if closed else data
+
+
+def _flattened_data(entity):
+    """通用后备：经 ezdxf.path 展平为折线"""
+    path_module = load('ezdxf.path')
+    parts = []
+    for sub_path in path_module.make_path(entity).sub_paths():
+        points = [(v.x, v.y) for v in sub_path.flattening(SVG_FLATTEN_TOLERANCE)]
+        if len(points) >= 2:
+            parts.append(_polyline_data(points, sub_path.is_closed))
+    return ''.join(parts)
+
+
+def _hatch_data(hatch):
+    parts = []
+    for boundary in hatch.paths:
+        kind = type(boundary).__name__
+        if kind == 'PolylinePath':
+            parts.append(_bulge_data(boundary.vertices, True))
+            continue
+        edges = boundary.edges
+        if len(edges) == 1 and type(edges[0]).__name__ == 'SplineEdge':
+            edge = edges[0]
+            data = _spline_data(edge.control_points, edge.knot_values, edge.degree, closed=True)
+            if data is not None:
+                parts.append(data)
+                continue
+        # 其他边界形式整体展平
+        return _flattened_data(hatch)
+    return ''.join(parts)
+
+
+def _fill_color(hatch):
+    # 与导出参数对应：ACI 7 为白色填充，其余（黑色填充使用的 0）为黑色
+    return '#fff' if hatch.dxf.color == 7 else '#000'
+
+
+def _entity_element(entity):
+    """单个实体 → SVG 元素字符串，不支持且无法展平的实体返回 None"""
+    dxftype = entity.dxftype()
+    if dxftype == 'LWPOLYLINE':
+        data = _bulge_data(_lwpolyline_xyb(entity), entity.closed)
+    elif dxftype == 'SPLINE':
+        data = _spline_data(entity.control_points, entity.knots, entity.dxf.degree, entity.closed)
+        if data is None:
+            data = _flattened_data(entity)
+    elif dxftype == 'HATCH':
+        data = _hatch_data(entity)
+        return f'<path fill="{_fill_color(entity)}" fill-rule="evenodd" stroke="none" d="{data}"/>\n'
+    else:
+        try:
+            data = _flattened_data(entity)
+        except TypeError:
+            return None
+    return f'<path d="{data}"/>\n'
+
+
+def _view_box(doc):
+    """图纸范围：优先使用模型空间记录的范围（保存时写入 $EXTMIN/$EXTMAX），未设置时计算实体包围盒"""
+    msp = doc.modelspace()
+    extmin = msp.dxf.get('extmin', (1e20, 1e20, 1e20))
+    extmax = msp.dxf.get('extmax', (-1e20, -1e20, -1e20))
+    if extmax[0] < extmin[0] or extmax[1] < extmin[1]:
+        box = load('ezdxf.bbox').extents(msp, fast=True)
+        if not box.has_data:
+            return 0, 0, 1, 1
+        extmin, extmax = box.extmin, box.extmax
+    return extmin[0], extmin[1], max(extmax[0] - extmin[0], 1), max(extmax[1] - extmin[1], 1)
+
+
+def write_svg(doc, stream):
+    """把文档模型空间写入文本流，逐个实体输出，不保留完整的 SVG 字符串"""
+    x, y, width, height = _numbers(_view_box(doc))
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{x} {y} {width} {height}" '
+                 f'width="{width}" height="{height}">\n'
+                 f'<g fill="none" stroke="{SVG_STROKE}" stroke-width="{SVG_STROKE_WIDTH}" '
+                 'stroke-linejoin="round" stroke-linecap="round">\n')
+    for entity in doc.modelspace():
+        element = _entity_element(entity)
+        if element is not None:
+            stream.write(element)
+    stream.write('</g>\n</svg>\n')
@@ -0,0 +1,196 @@
+"""
+骨架化（细化）后端
+单线条模式把二值图细化为单像素宽的骨架。可选后端：
+  opencv     - cv2.ximgproc.thinning（需要 opencv-contrib-python），Zhang-Suen
+  zhang_suen - NumPy/OpenCV 向量化的 Zhang-Suen，直接处理 uint8
+  guo_hall   - 同上，Guo-Hall 判据，斜线上的骨架更对称
+  skimage    - scikit-image 的 skeletonize，作为兼容后备
+所有后端输入输出均为 0/255 的 uint8 图像
+"""
+
+import importlib.util
+import logging
+
+import numpy as np
+import cv2
+
+from startup import load
+
+logger = logging.getLogger(__name__)
+
+# auto 时按顺序选择第一个可用的后端
+AUTO_ORDER = ('opencv', 'zhang_suen')
+
+# 8 邻域编码：位 k 对应 P(k+2)，P2 为正上方，顺时针排列
+#   P9 P2 P3        128  1  2
+#   P8 P1 P4   ->    64  0  4
+#   P7 P6 P5         32 16  8
+
+
+def _bits(code):
+    # 返回 P2..P9
+    return [(code >> k) & 1 for k in range(8)]
+
+
+def _zhang_suen_deletable(code, first):
+    p2, p3, p4, p5, p6, p7, p8, p9 = _bits(code)
+    neighbors = (p2, p3, p4, p5, p6, p7, p8, p9)
+    b = sum(neighbors)
+    # P2→P3→…→P9→P2 序列中 0→1 的次数
+    a = sum(neighbors[i] == 0 and neighbors[(i + 1) % 8] == 1 for i in range(8))
+    if first:
+        m = p2 * p4 * p6 == 0 and p4 * p6 * p8 == 0
+    else:
+        m = p2 * p4 * p8 == 0 and p2 * p6 * p8 == 0
+    return 2 <= b <= 6 and a == 1 and m
+
+
+def _guo_hall_deletable(code, first):
+    p2, p3, p4, p5, p6, p7, p8, p9 = _bits(code)
+    c = ((not p2 and (p3 or p4)) + (not p4 and (p5 or p6))
+         + (not p6 and (p7 or p8)) + (not p8 and (p9 or p2)))
+    n1 = (p9 or p2) + (p3 or p4) + (p5 or p6) + (p7 or p8)
+    n2 = (p2 or p3) + (p4 or p5) + (p6 or p7) + (p8 or p9)
+    n = min(n1, n2)
+    if first:
+        m = (p6 or p7 or not p9) and p8
+    else:
+        m = (p2 or p3 or not p5) and p4
+    return c == 1 and 2 <= n <= 3 and not m
+
+
+def _build_luts(deletable):
+    """两个子迭代各一张 256 项查找表：邻域编码 → 是否删除（0/1）"""
+    return tuple(np.array([deletable(code, first) for code in range(256)], dtype=np.uint8)
+                 for first in (True, False))
+
+
+_LUTS = {
+    'zhang_suen': _build_luts(_zhang_suen_deletable),
+    'guo_hall': _build_luts(_guo_hall_deletable),
+}
+
+
+def _no_check():
+    pass
+
+
+def _neighbor_offsets(stride):
+    """P2..P9 在按行展开的数组中相对 P1 的偏移"""
+    return np.array([-stride, -stride + 1, 1, stride + 1, stride, stride - 1, -1, -stride - 1])
+
+
+def _thin_lut(binary, luts, check):
+    """查找表细化：两个子迭代交替，用 8 邻域编码查表决定是否删除
+
+    只计算候选像素：初始为前景的边界像素，之后为最近两个子迭代中被删除像素的
+    前景邻居。邻域没有变化的像素在两种子迭代下的判定结果都不会变，无需重复计算，
+    因此耗时与边界长度而非图像面积成正比，粗笔画和大面积前景也不会逐轮扫描整图。
+    """
+    h, w = binary.shape
+    stride = w + 2
+    # 外加一圈 0，邻居下标不会越界
+    fg = np.zeros((h + 2, stride), np.uint8)
+    fg[1:-1, 1:-1] = binary > 0
+    flat = fg.reshape(-1)
+    offsets = _neighbor_offsets(stride)
+
+    # 内部像素（8 邻域全为前景）不满足任何删除条件
+    interior = cv2.erode(fg, np.ones((3, 3), np.uint8), borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    boundary = cv2.subtract(fg, interior)
+    initial = np.flatnonzero(boundary)
+    # 去重用的标记数组：每个候选写入自己的序号，读回相同序号的才是该像素的保留项
+    stamp = np.empty(flat.size, np.intp)
+
+    def foreground_unique(indices):
+        """只保留仍为前景的像素并去重（散列写入代替排序，与候选数量成线性）"""
+        indices = indices[flat[indices] == 1]
+        order = np.arange(len(indices))
+        stamp[indices] = order
+        return indices[stamp[indices] == order]
+
+    recent = [initial, initial]
+    iterations = 0
+    while True:
+        check()
+        iterations += 1
+        deleted_any = False
+        for lut in luts:
+            candidates = foreground_unique(np.concatenate(recent))
+            if len(candidates) == 0:
+                break
+            # 逐个方向取邻居并按位拼成编码，避免 (N, 8) 的临时下标数组
+            code = np.zeros(len(candidates), np.uint8)
+            for bit, offset in enumerate(offsets):
+                code |= np.take(flat, candidates + offset) << bit
+            deleted = candidates[lut[code] == 1]
+            flat[deleted] = 0
+            deleted_any = deleted_any or len(deleted) > 0
+            # 被删除像素的邻居在后两个子迭代中重新判定
+            recent = [recent[1], foreground_unique((deleted[:, None] + offsets).reshape(-1))]
+        if not deleted_any:
+            break
+    logger.debug("细化迭代次数：%d", iterations)
+    skeleton = fg[1:-1, 1:-1]
+    np.multiply(skeleton, 255, out=skeleton)
+    return np.ascontiguousarray(skeleton)
+
+
+def _thin_zhang_suen(binary, check):
+    return _thin_lut(binary, _LUTS['zhang_suen'], check)
+
+
+def _thin_guo_hall(binary, check):
+    return _thin_lut(binary, _LUTS['guo_hall'], check)
+
+
+def _thin_opencv(binary, check):
+    check()
+    return cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+
+
+def _thin_skimage(binary, check):
+    skeletonize = load('skimage.morphology').skeletonize
+    check()
+    return skeletonize(binary > 0).view(np.uint8) * np.uint8(255)
+
+
+BACKENDS = {
+    'opencv': _thin_opencv,
+    'zhang_suen': _thin_zhang_suen,
+    'guo_hall': _thin_guo_hall,
+    'skimage': _thin_skimage,
+}
+
+
+def _is_available(name):
+    if name == 'opencv':
+        return hasattr(cv2, 'ximgproc')
+    if name == 'skimage':
+        # 只查找不导入，scikit-image 的导入开销留到真正使用时
+        return importlib.util.find_spec('skimage') is not None
+    return True
+
+
+def available_backends():
+    """当前环境可用的后端名称"""
+    return [name for name in BACKENDS if _is_available(name)]
+
+
+def resolve_backend(name='auto'):
+    """把 auto 解析为具体后端，指定的后端不可用时报错"""
+    if name == 'auto':
+        return next(n for n in AUTO_ORDER if _is_available(n))
+    if name not in BACKENDS:
+        raise ValueError(f"未知的骨架化后端：{name}")
+    if not _is_available(name):
+        raise ValueError(f"骨架化后端不可用：{name}")
+    return name
+
+
+def thin(binary, backend='auto', check=None):
+    """把二值图（非 0 为前景）细化为单像素骨架，返回 0/255 的 uint8 图像
+
+    check 在每轮迭代前调用，抛出异常即可中止（用于取消过期的预览请求）。
+    """
+    return BACKENDS[resolve_backend(backend)](binary, check or _no_check)
@@ -0,0 +1,143 @@
+"""
+阈值建议与阈值扫描
+每张图的灰度直方图只计算一次（阶段缓存），Otsu / 三角法阈值与各阈值下的前景像素数都由直方图直接得出；
+轮廓数按扫描点逐个用查找表（LUT）对缓存的灰度图二值化后统计，不经过完整的预处理流水线
+"""
+
+import numpy as np
+import cv2
+
+from metrics import timed
+from pipeline import BORDER_SIZE, stage_cache, to_gray
+
+# 默认扫描间隔（灰度级），0-255 共 32 个扫描点
+SWEEP_STEP = 8
+# 最小扫描间隔，限制单次请求的轮廓统计次数（间隔 4 时最多 64 + 2 次）
+SWEEP_MIN_STEP = 4
+
+# 与 OpenCV 的 Otsu 实现一致，类别概率低于该值的阈值不参与比较
+_OTSU_EPSILON = np.finfo(np.float32).eps
+
+
+def gray_histogram(image_id, img):
+    """灰度直方图（256 级，int64），按图像缓存"""
+    def compute():
+        gray = to_gray(image_id, img)
+        with timed('histogram'):
+            hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        hist = hist.astype(np.int64)
+        hist.flags.writeable = False
+        return hist
+    return stage_cache.get_or_create(('histogram', image_id), compute)
+
+
+def otsu_threshold(hist):
+    """由直方图计算 Otsu 阈值（类间方差最大），结果与 cv2.THRESH_OTSU 相同"""
+    p = hist / max(hist.sum(), 1)
+    levels = np.arange(len(hist))
+    q1 = np.cumsum(p)
+    q2 = 1.0 - q1
+    m1 = np.cumsum(levels * p)
+    mu = m1[-1]
+    valid = (np.minimum(q1, q2) >= _OTSU_EPSILON) & (np.maximum(q1, q2) <= 1.0 - _OTSU_EPSILON)
+    if not valid.any():
+        return 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu1 = m1 / q1
+        mu2 = (mu - m1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) ** 2
+    sigma = np.where(valid, sigma, 0.0)
+    return int(np.argmax(sigma))
+
+
+def triangle_threshold(hist):
+    """由直方图计算三角法阈值，结果与 cv2.THRESH_TRIANGLE 相同
+
+    适合大面积背景加少量线条的图纸：从直方图峰值向较长的一侧连线，取距离该线最远的灰度级。
+    """
+    n = len(hist)
+    nonzero = np.flatnonzero(hist)
+    if len(nonzero) == 0:
+        return 0
+    left = max(int(nonzero[0]) - 1, 0)
+    # 与 OpenCV 一致：右边界只在 1-255 中查找，找不到时为 0，再向右扩展一级
+    right = min(int(nonzero[-1]) + 1, n - 1)
+    peak = int(np.argmax(hist))
+    h = hist
+    flipped = peak - left < right - peak
+    if flipped:
+        h = hist[::-1]
+        left = n - 1 - right
+        peak = n - 1 - peak
+    a = int(h[peak])
+    b = left - peak
+    thresh = left
+    if peak > left:
+        levels = np.arange(left + 1, peak + 1)
+        dist = a * levels + b * h[left + 1:peak + 1]
+        best = int(np.argmax(dist))
+        if dist[best] > 0:
+            thresh = left + 1 + best
+    thresh -= 1
+    if flipped:
+        thresh = n - 1 - thresh
+    return thresh
+
+
+def foreground_counts(hist, invert):
+    """各阈值（0-255）下二值图中前景（非零）像素数
+
+    THRESH_BINARY 时灰度大于阈值的像素为前景，反色时小于等于阈值的像素为前景。
+    """
+    at_or_below = np.cumsum(hist)
+    return at_or_below if invert else at_or_below[-1] - at_or_below
+
+
+def _threshold_lut(threshold, invert):
+    below = np.arange(256) <= threshold
+    return np.where(below == invert, 255, 0).astype(np.uint8)
+
+
+def contour_counts(gray, thresholds, invert, ignore_border):
+    """各阈值下 findContours(RETR_LIST) 的轮廓数，与非单线条模式的转换结果一致"""
+    binary = np.empty_like(gray)
+    counts = []
+    for threshold in thresholds:
+        cv2.LUT(gray, _threshold_lut(threshold, invert), dst=binary)
+        image = binary
+        if ignore_border:
+            image = cv2.copyMakeBorder(binary, BORDER_SIZE, BORDER_SIZE, BORDER_SIZE, BORDER_SIZE,
+                                       cv2.BORDER_CONSTANT, value=255)
+        contours, _ = cv2.findContours(image, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        counts.append(len(contours))
+    return counts
+
+
+def threshold_sweep(image_id, img, invert=False, ignore_border=False, step=SWEEP_STEP):
+    """阈值建议与扫描曲线，按 (图像, 反色, 忽略边缘, 间隔) 缓存
+
+    返回 {'otsu', 'triangle', 'histogram', 'thresholds', 'foreground', 'contours', 'pixels'}，
+    前景像素数覆盖扫描点，不含加边框的像素。
+    """
+    step = max(int(step), SWEEP_MIN_STEP)
+
+    def compute():
+        hist = gray_histogram(image_id, img)
+        otsu = otsu_threshold(hist)
+        triangle = triangle_threshold(hist)
+        # 扫描点总是包含两个建议阈值，便于界面直接吸附
+        thresholds = sorted(set(range(0, 256, step)) | {otsu, triangle})
+        foreground = foreground_counts(hist, invert)[thresholds]
+        gray = to_gray(image_id, img)
+        with timed('threshold_sweep'):
+            contours = contour_counts(gray, thresholds, invert, ignore_border)
+        return {
+            'otsu': otsu,
+            'triangle': triangle,
+            'histogram': hist.tolist(),
+            'thresholds': thresholds,
+            'foreground': foreground.tolist(),
+            'contours': contours,
+            'pixels': int(hist.sum()),
+        }
+    return stage_cache.get_or_create(('threshold_sweep', image_id, invert, ignore_border, step), compute)
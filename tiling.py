@@ -0,0 +1,240 @@
+"""
+分块全分辨率矢量化
+把图像切成整宽的水平条带（相邻条带共享一行接缝），逐条二值化并提取轮廓，
+再沿接缝把被切断的轮廓拼接成完整轮廓。二值图、轮廓追踪等工作缓冲区
+只与条带大小成正比，不需要整幅二值图
+"""
+
+import numpy as np
+import cv2
+
+from pipeline import BORDER_SIZE, compress_collinear
+
+# 每个条带的行数（不含共享的接缝行）
+TILE_HEIGHT = 1024
+
+
+def _strip_binary(gray, r0, r1, threshold, invert, border):
+    """生成带白色边框的虚拟图像中第 r0..r1 行的二值条带"""
+    h, w = gray.shape
+    strip = np.full((r1 - r0 + 1, w + 2 * border), 255, dtype=np.uint8)
+    src0 = max(r0 - border, 0)
+    src1 = min(r1 - border, h - 1)
+    if src1 >= src0:
+        mode = cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY
+        _, part = cv2.threshold(gray[src0:src1 + 1], threshold, 255, mode)
+        strip[src0 + border - r0:src1 + border - r0 + 1, border:border + w] = part
+    return strip
+
+
+# 8 邻域按逆时针（y 轴向下的屏幕坐标）排列，与 OpenCV 边界跟踪的搜索顺序一致
+_CCW_OFFSETS = [(1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0)]
+
+
+def _expand_closed(points):
+    """把 CHAIN_APPROX_SIMPLE 的顶点展开为逐像素的闭合路径"""
+    delta = np.roll(points, -1, axis=0) - points
+    steps = np.maximum(np.abs(delta).max(axis=1), 1)
+    idx = np.repeat(np.arange(len(points)), steps)
+    offsets = np.arange(len(idx)) - np.repeat(np.cumsum(steps) - steps, steps)
+    return points[idx] + np.sign(delta)[idx] * offsets[:, None]
+
+
+def _split_chains(points, seam):
+    """把与接缝相交的轮廓拆成若干链，每条链以接缝点开始和结束"""
+    # 旋转到接缝点开始，并在末尾补上起点形成闭环
+    first = int(np.argmax(seam))
+    points = np.roll(points, -first, axis=0)
+    seam = np.roll(seam, -first)
+    points = np.vstack([points, points[:1]])
+    seam = np.concatenate([seam, [True]])
+
+    seam_idx = np.flatnonzero(seam)
+    starts = np.flatnonzero(seam[:-1] & ~seam[1:])
+    ends = seam_idx[np.searchsorted(seam_idx, starts + 1)]
+    return [points[s:e + 1] for s, e in zip(starts, ends)]
+
+
+def _next_border_pixel(window, seam_y, prev, cur):
+    """在接缝附近按 OpenCV 的规则跟踪边界：从上一点开始绕当前点逆时针搜索下一个前景像素
+
+    window 为接缝行及其上下各一行组成的 3 行二值图。
+    """
+    width = window.shape[1]
+    k = _CCW_OFFSETS.index((prev[0] - cur[0], prev[1] - cur[1]))
+    for step in range(1, 9):
+        dx, dy = _CCW_OFFSETS[(k + step) % 8]
+        x, y = cur[0] + dx, cur[1] + dy
+        if 0 <= x < width and window[y - seam_y + 1, x]:
+            return (x, y)
+    return None
+
+
+def _stitch(chains, seam_windows):
+    """沿接缝把链首尾相接，返回拼接后的闭合轮廓列表
+
+    链的终点落在接缝上，从终点开始在整幅图像的接缝邻域里继续跟踪边界，
+    沿接缝行前进直到离开接缝，离开时的 (接缝点, 下一点) 唯一确定后继链的起点。
+    """
+    heads = {}
+    for i, points in enumerate(chains):
+        heads[(tuple(points[0].tolist()), tuple(points[1].tolist()))] = i
+
+    successor = {}
+    bridges = {}
+    for i, points in enumerate(chains):
+        prev = tuple(points[-2].tolist())
+        cur = tuple(points[-1].tolist())
+        seam_y = cur[1]
+        window = seam_windows[seam_y]
+        bridge = []
+        # 沿接缝行前进的步数不会超过该行像素数的两倍
+        for _ in range(2 * window.shape[1] + 2):
+            nxt = _next_border_pixel(window, seam_y, prev, cur)
+            if nxt is None:
+                break
+            if nxt[1] != seam_y:
+                j = heads.get((cur, nxt))
+                if j is not None:
+                    successor[i] = j
+                    bridges[i] = bridge
+                break
+            bridge.append(nxt)
+            prev, cur = cur, nxt
+
+    contours = []
+    visited = set()
+    for start in range(len(chains)):
+        if start in visited:
+            continue
+        parts = []
+        i = start
+        while i is not None and i not in visited:
+            visited.add(i)
+            points = chains[i]
+            # 本链起点与前一条链的终点（或接缝桥接段的最后一点）重合，去掉重复点
+            parts.append(points[1:] if parts else points)
+            if bridges.get(i):
+                parts.append(np.array(bridges[i], dtype=points.dtype))
+            i = successor.get(i)
+        contour = np.vstack(parts)
+        if len(contour) > 1 and np.array_equal(contour[0], contour[-1]):
+            contour = contour[:-1]
+        contours.append(contour)
+    return contours
+
+
+def _build_hierarchy(contours):
+    """按轮廓方向与包含关系重建 RETR_CCOMP 格式的两级层次结构
+
+    OpenCV 的外轮廓有向面积为负，孔洞为正；孔洞归属于包含它的面积最小的外轮廓。
+    """
+    n = len(contours)
+    hierarchy = np.full((n, 4), -1, dtype=np.int64)
+    if n == 0:
+        return hierarchy
+
+    # 拼接所有轮廓，用 reduceat 一次算出每条轮廓的外接框和有向面积
+    lengths = np.array([len(c) for c in contours])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points = np.concatenate(contours)
+    nxt = np.arange(len(points)) + 1
+    nxt[starts + lengths - 1] = starts
+    cross = points[:, 0] * points[nxt, 1] - points[nxt, 0] * points[:, 1]
+    areas = 0.5 * np.add.reduceat(cross, starts)
+    mins = np.minimum.reduceat(points, starts, axis=0)
+    maxs = np.maximum.reduceat(points, starts, axis=0)
+
+    outers = np.flatnonzero(areas <= 0)
+    holes = np.flatnonzero(areas > 0)
+
+    children = {}
+    for h in holes:
+        cand = outers[np.all(mins[outers] <= mins[h], axis=1) & np.all(maxs[outers] >= maxs[h], axis=1)]
+        probe = (float(contours[h][0][0]), float(contours[h][0][1]))
+        for o in cand[np.argsort(np.abs(areas[cand]))]:
+            if cv2.pointPolygonTest(contours[o].astype(np.float32), probe, False) >= 0:
+                children.setdefault(int(o), []).append(int(h))
+                break
+
+    for parent, kids in children.items():
+        hierarchy[parent, 2] = kids[0]
+        for k, child in enumerate(kids):
+            hierarchy[child, 3] = parent
+            hierarchy[child, 0] = kids[k + 1] if k + 1 < len(kids) else -1
+            hierarchy[child, 1] = kids[k - 1] if k > 0 else -1
+    # 找不到外轮廓的孔洞不参与填充
+    orphans = [int(h) for h in holes if hierarchy[h, 3] == -1]
+    hierarchy[orphans, 3] = orphans
+    return hierarchy
+
+
+def tiled_contours(gray, threshold, invert, ignore_border, tile_height=TILE_HEIGHT,
+                   with_hierarchy=False):
+    """分块提取全分辨率灰度图的轮廓
+
+    返回 (polylines, hierarchy)：polylines 为 [(points, True), ...]，与整图
+    findContours(RETR_LIST, CHAIN_APPROX_SIMPLE) 得到的轮廓一致；
+    with_hierarchy 为真时同时返回与 findContours 形状相同的 RETR_CCOMP 层次结构，否则为 None。
+    """
+    # 条带至少要有一行不在接缝上的像素
+    tile_height = max(tile_height, 2)
+    border = BORDER_SIZE if ignore_border else 0
+    total_h = gray.shape[0] + 2 * border
+
+    complete = []
+    stitched = []
+    chains = []
+    # 每条接缝保存其上下各一行，共 3 行，用于沿接缝跟踪边界
+    seam_windows = {}
+    above_row = None
+
+    r0 = 0
+    while True:
+        r1 = min(r0 + tile_height, total_h - 1)
+        strip = _strip_binary(gray, r0, r1, threshold, invert, border)
+        top_seam = r0 if r0 > 0 else None
+        bottom_seam = r1 if r1 < total_h - 1 else None
+        if bottom_seam is not None:
+            seam_windows[bottom_seam] = np.zeros((3, strip.shape[1]), dtype=np.uint8)
+            seam_windows[bottom_seam][:2] = strip[-2:]
+        if top_seam is not None:
+            seam_windows[top_seam][2] = strip[1]
+
+        contours, _ = cv2.findContours(strip, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            points = contour.reshape(-1, 2).copy()
+            points[:, 1] += r0
+            # 接缝行是条带的首末行，轮廓经过接缝时必然有顶点落在接缝上
+            ys = points[:, 1]
+            if not ((top_seam is not None and (ys == top_seam).any()) or
+                    (bottom_seam is not None and (ys == bottom_seam).any())):
+                complete.append(points.astype(np.float64))
+                continue
+
+            # 与接缝相交的轮廓展开为逐像素路径后再拆分
+            points = _expand_closed(points)
+            on_top = points[:, 1] == top_seam
+            on_bottom = points[:, 1] == bottom_seam
+            seam = on_top | on_bottom
+            if seam.all():
+                # 整条轮廓都在接缝行上：只由下方条带输出，且上一行没有相连的前景
+                if on_top.all():
+                    x0 = max(points[:, 0].min() - 1, 0)
+                    x1 = points[:, 0].max() + 2
+                    if not above_row[x0:x1].any():
+                        stitched.append(points)
+            else:
+                chains.extend(_split_chains(points, seam))
+
+        if bottom_seam is None:
+            break
+        # 记录接缝上一行，供下一条带判断接缝行上的孤立轮廓
+        above_row = strip[-2].copy()
+        del strip, contours
+        r0 = r1
+
+    stitched.extend(_stitch(chains, seam_windows))
+    contours = complete + [compress_collinear(c.astype(np.float64), True) for c in stitched]
+    hierarchy = _build_hierarchy(contours)[None] if with_hierarchy else None
+    return [(c, True) for c in contours], hierarchy
@@ -0,0 +1,636 @@
+"""
+矢量化核心
+从预处理后的图像提取轮廓或中心线，经插值/平滑/简化后生成 ezdxf 文档。
+与 Flask 无关，可在请求线程中直接调用，也可在任务进程池中执行
+"""
+
+import hashlib
+import heapq
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import cv2
+
+from dxf_writer import PolylineDocument
+from jobs import JOB_WORKERS
+from metrics import add_time, collect, count, peak_rss_bytes, timed
+from output_formats import OUTPUT_FORMATS, write_document
+from pipeline import centerlines, decode_image, preprocess
+from splines import arc_polylines, smooth_polylines, spline_polylines, clamped_knots
+from startup import load
+from tiling import tiled_contours
+
+logger = logging.getLogger(__name__)
+
+# 曲线边缘模式默认的弦高误差（像素）
+CURVE_TOLERANCE = 0.1
+# 曲线边缘模式的输出形式：polyline 为采样后的折线，spline 为 SPLINE 实体，arc 为带凸度的 LWPOLYLINE
+CURVE_OUTPUTS = ('polyline', 'spline', 'arc')
+# 增加曲线数量模式（high_precision=more_points_<倍数>）允许的最大插值倍数
+MAX_POINTS_FACTOR = 64
+# 折线简化算法：dp 为 Douglas-Peucker，vw 为 Visvalingam-Whyatt
+SIMPLIFY_METHODS = ('dp', 'vw')
+# 只含 LWPOLYLINE/HATCH 的 ASCII DXF（及其压缩格式）直接输出组码，不构建 ezdxf 实体对象
+DIRECT_DXF_WRITER = True
+DIRECT_DXF_FORMATS = ('dxf', 'dxf_gz', 'dxf_zip')
+# 矢量化结果所在的图层
+OUTPUT_LAYER = 'OPENCV_OUTLINE'
+# 多阈值分层输出：最多的层数、并行处理的线程数，以及各层的图层颜色（ACI，按阈值从低到高循环使用）
+# 分层线程池在每个进程内由所有转换共用：服务进程中同步转换共用 LEVEL_WORKERS 个线程，
+# 任务进程池的 JOB_WORKERS 个进程各用 JOB_LEVEL_WORKERS 个线程，合计不超过核数
+MAX_THRESHOLD_LEVELS = 16
+LEVEL_WORKERS = os.cpu_count() or 2
+JOB_LEVEL_WORKERS = max(1, LEVEL_WORKERS // JOB_WORKERS)
+LEVEL_LAYER_COLORS = (1, 2, 3, 4, 5, 6)
+
+
+def interpolate_points(points, factor=8, closed=True):
+    """插值增加点数，提高曲线精度（输入输出均为 (N, 2) 数组）"""
+    points = np.asarray(points, dtype=np.float64)
+    if factor <= 1:
+        return points
+    if len(points) < 3:
+        logger.debug("点数太少(%d)，不进行插值", len(points))
+        return points
+    
+    logger.debug("开始插值：原始点数=%d，倍数=%d", len(points), factor)
+    
+    # 每个点与下一个点（闭合时首尾相接）之间插入factor-1个点
+    # t = 0 对应原始点本身，广播后形状为 (N, factor, 2)
+    if closed:
+        start, end = points, np.roll(points, -1, axis=0)
+    else:
+        start, end = points[:-1], points[1:]
+    t = np.arange(factor) / factor
+    new_points = start[:, None, :] + (end - start)[:, None, :] * t[None, :, None]
+    new_points = new_points.reshape(-1, 2)
+    if not closed:
+        # 开放折线补上终点
+        new_points = np.vstack([new_points, points[-1:]])
+    
+    logger.debug("插值完成：新点数=%d，增加了%d个点", len(new_points), len(new_points) - len(points))
+    return new_points
+
+
+def smooth_curves(polylines, tolerance=CURVE_TOLERANCE):
+    """使用样条曲线平滑所有 (points, closed) 折线，返回与输入一一对应的点数组
+
+    所有轮廓分批一起拟合，采样点数按曲率自适应，弦高误差不超过 tolerance（像素）。
+    """
+    try:
+        return smooth_polylines(polylines, tolerance)
+    except ImportError:
+        # 如果scipy不可用，使用简单的线性插值
+        logger.info("未安装scipy，曲线边缘模式使用线性插值")
+        return [interpolate_points(points, factor=8, closed=closed) for points, closed in polylines]
+
+
+def smooth_curve(points, closed=True, tolerance=CURVE_TOLERANCE):
+    """使用样条曲线平滑单条轮廓"""
+    return smooth_curves([(np.asarray(points, dtype=np.float64), closed)], tolerance)[0]
+
+
+def visvalingam_whyatt(points, min_area, closed=True):
+    """Visvalingam-Whyatt 简化：反复删除与相邻点构成三角形面积最小的顶点"""
+    n = len(points)
+    min_keep = 3 if closed else 2
+    if n <= min_keep:
+        return points
+
+    xs = points[:, 0].tolist()
+    ys = points[:, 1].tolist()
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    if closed:
+        prev[0] = n - 1
+        nxt[-1] = 0
+
+    def area(i):
+        p, q = prev[i], nxt[i]
+        if p < 0 or q >= n:
+            # 开放折线的端点始终保留
+            return float('inf')
+        return abs((xs[p] - xs[i]) * (ys[q] - ys[i]) - (xs[q] - xs[i]) * (ys[p] - ys[i])) * 0.5
+
+    areas = [area(i) for i in range(n)]
+    heap = [(a, i) for i, a in enumerate(areas)]
+    heapq.heapify(heap)
+    removed = np.zeros(n, dtype=bool)
+    remaining = n
+
+    while heap and remaining > min_keep:
+        a, i = heapq.heappop(heap)
+        if removed[i] or a != areas[i]:
+            continue  # 过期的堆条目
+        if a >= min_area:
+            break
+        removed[i] = True
+        remaining -= 1
+        p, q = prev[i], nxt[i]
+        nxt[p] = q
+        prev[q] = p
+        for j in (p, q):
+            # 新面积不小于刚删除点的面积，保证删除顺序单调
+            areas[j] = max(area(j), a)
+            heapq.heappush(heap, (areas[j], j))
+
+    return points[~removed]
+
+
+def simplify_polyline(points, tolerance, method='dp', closed=True):
+    """按容差（像素，即图纸单位）简化折线
+
+    method 为 'dp' 时使用 Douglas-Peucker（cv2.approxPolyDP），
+    为 'vw' 时使用 Visvalingam-Whyatt，面积阈值取 tolerance²。
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return points
+    if method == 'vw':
+        return visvalingam_whyatt(points, tolerance * tolerance, closed=closed)
+    approx = cv2.approxPolyDP(points.astype(np.float32).reshape(-1, 1, 2), tolerance, closed)
+    return approx.reshape(-1, 2).astype(np.float64)
+
+
+def _add_boundary(paths, shape, kind, flags):
+    """按实体类型把闭合轮廓加入 HATCH 边界"""
+    if kind == 'spline':
+        edges = paths.add_edge_path(flags=flags)
+        edges.add_spline(control_points=shape, knot_values=clamped_knots(len(shape)), degree=3)
+    else:
+        # 折线与圆弧的 (x, y, 凸度) 顶点都可以直接作为多段线边界
+        paths.add_polyline_path(shape, is_closed=True, flags=flags)
+
+
+def hatch_groups(shapes, hierarchy):
+    """按RETR_CCOMP层次结构分组，逐个产出 (外轮廓序号, [孔洞序号])
+
+    hierarchy 每行为 [next, prev, first_child, parent]，顶层轮廓是外边界，
+    其子轮廓是孔洞，作为同一个HATCH的内边界（奇偶填充规则）。被过滤掉的轮廓（None）跳过。
+    """
+    for i, (_, _, first_child, parent) in enumerate(hierarchy):
+        if parent != -1 or shapes[i] is None:
+            continue
+        # 遍历所有孔洞（同级链表）
+        holes = []
+        child = first_child
+        while child != -1:
+            if shapes[child] is not None:
+                holes.append(child)
+            child = hierarchy[child][0]
+        yield i, holes
+
+
+def add_fill_hatches(msp, shapes, hierarchy, color, kinds=None, layer=OUTPUT_LAYER):
+    """按RETR_CCOMP层次结构生成HATCH填充，返回HATCH数量
+
+    kinds 为每条轮廓的实体类型（polyline / spline / arc），默认均为折线。
+    """
+    const = load('ezdxf').const
+    kinds = kinds or ['polyline'] * len(shapes)
+    total = 0
+    for outer, holes in hatch_groups(shapes, hierarchy):
+        hatch = msp.add_hatch(color=color, dxfattribs={'layer': layer})
+        _add_boundary(hatch.paths, shapes[outer], kinds[outer], const.BOUNDARY_PATH_EXTERNAL)
+        for hole in holes:
+            _add_boundary(hatch.paths, shapes[hole], kinds[hole], const.BOUNDARY_PATH_DEFAULT)
+        total += 1
+    return total
+
+
+def level_layer(threshold):
+    """多阈值分层输出中阈值对应的图层名"""
+    return f'{OUTPUT_LAYER}_{threshold}'
+
+
+def _new_document(width, height, layers=((OUTPUT_LAYER, 7),)):
+    """新建 R2000 文档：输出图层 [(名称, 颜色)]，图纸范围即图像范围"""
+    doc = load('ezdxf').new('R2000')
+    msp = doc.modelspace()
+    for name, color in layers:
+        doc.layers.new(name, dxfattribs={'color': color})
+    # CAD 打开时按此缩放，SVG 输出以此为画布
+    # ezdxf 保存时用模型空间的范围覆盖文档头，但会跳过 (0, 0, 0)，所以两处都要设置
+    msp.dxf.extmin = doc.header['$EXTMIN'] = (0, 0, 0)
+    msp.dxf.extmax = doc.header['$EXTMAX'] = (width, height, 0)
+    return doc
+
+
+def _build_direct_document(levels, hatch_color, width, height):
+    """直接输出组码的文档，实体及其顺序与 ezdxf 路径相同：逐层先填充，后线条；返回 (doc, HATCH数量)"""
+    const = load('ezdxf').const
+    doc = PolylineDocument(width, height, levels[0]['layer'], layer_color=levels[0]['color'])
+    for level in levels[1:]:
+        doc.add_layer(level['layer'], level['color'])
+    total_hatches = 0
+    for level in levels:
+        shapes, hierarchy, layer = level['shapes'], level['hierarchy'], level['layer']
+        if hatch_color is not None and hierarchy is not None:
+            for outer, holes in hatch_groups(shapes, hierarchy):
+                boundaries = [(shapes[outer], const.BOUNDARY_PATH_EXTERNAL)]
+                boundaries += [(shapes[hole], const.BOUNDARY_PATH_DEFAULT) for hole in holes]
+                doc.add_hatch(hatch_color, boundaries, layer)
+                total_hatches += 1
+        for points, (_, closed) in zip(shapes, level['polylines']):
+            if points is not None:
+                doc.add_lwpolyline(points, closed, layer)
+    return doc, total_hatches
+
+
+def _build_ezdxf_document(levels, hatch_color, width, height):
+    """ezdxf 文档，支持 SPLINE 及所有输出格式；返回 (doc, HATCH数量)"""
+    doc = _new_document(width, height, [(level['layer'], level['color']) for level in levels])
+    msp = doc.modelspace()
+    total_hatches = 0
+    for level in levels:
+        shapes, kinds, layer = level['shapes'], level['kinds'], level['layer']
+        # 添加填充：每个外轮廓一个HATCH，其孔洞作为内边界
+        if hatch_color is not None and level['hierarchy'] is not None:
+            total_hatches += add_fill_hatches(msp, shapes, level['hierarchy'], hatch_color, kinds, layer)
+
+        # 添加线条
+        for points, kind, (_, closed) in zip(shapes, kinds, level['polylines']):
+            if points is None:
+                continue
+            if kind == 'spline':
+                # 夹持样条从首个控制点开始、在末个控制点结束，闭合轮廓的首尾控制点重合
+                msp.add_open_spline(points, degree=3, knots=clamped_knots(len(points)),
+                                    dxfattribs={'layer': layer})
+            elif kind == 'arc':
+                msp.add_lwpolyline(points, format='xyb', dxfattribs={'layer': layer, 'closed': closed})
+            else:
+                msp.add_lwpolyline(points, dxfattribs={'layer': layer, 'closed': closed})
+    return doc, total_hatches
+
+
+def parse_thresholds(value):
+    """解析多阈值分层输出的阈值列表（逗号或空格分隔），返回去重后的升序列表，未设置时为空"""
+    if not value:
+        return []
+    thresholds = sorted({int(v) for v in value.replace(',', ' ').split()})
+    if thresholds[0] < 0 or thresholds[-1] > 255:
+        raise ValueError("阈值必须在 0-255 之间")
+    if len(thresholds) > MAX_THRESHOLD_LEVELS:
+        raise ValueError(f"最多支持 {MAX_THRESHOLD_LEVELS} 个阈值")
+    return thresholds
+
+
+def parse_convert_params(form):
+    """从表单解析矢量化参数"""
+    params = {
+        'threshold': int(form.get('threshold', 128)),
+        # 非空时按每个阈值输出一个图层，忽略 threshold
+        'thresholds': parse_thresholds(form.get('thresholds')),
+        'invert': form.get('invert') == 'true',
+        'single_line': form.get('single_line') == 'true',
+        'ignore_border': form.get('ignore_border') == 'true',
+        'fill_color': form.get('fill_color', 'none'),
+        'high_precision': form.get('high_precision', 'none'),
+        'curve_tolerance': float(form.get('curve_tolerance') or CURVE_TOLERANCE),
+        'curve_output': form.get('curve_output') or 'polyline',
+        'simplify': float(form.get('simplify') or 0),
+        'simplify_method': form.get('simplify_method', 'dp'),
+        'full_resolution': form.get('full_resolution') == 'true',
+        'output_format': form.get('output_format') or 'dxf',
+    }
+    if params['curve_tolerance'] <= 0:
+        raise ValueError("曲线容差必须大于0")
+    if params['high_precision'].startswith('more_points_'):
+        factor = params['high_precision'][len('more_points_'):]
+        if not factor.isdigit() or not 1 <= int(factor) <= MAX_POINTS_FACTOR:
+            raise ValueError(f"插值倍数必须是 1-{MAX_POINTS_FACTOR} 之间的整数: {params['high_precision']}")
+        params['high_precision'] = f'more_points_{int(factor)}'
+    if params['curve_output'] not in CURVE_OUTPUTS:
+        raise ValueError(f"不支持的曲线输出形式: {params['curve_output']}")
+    if params['simplify_method'] not in SIMPLIFY_METHODS:
+        raise ValueError(f"不支持的简化算法: {params['simplify_method']}")
+    if params['output_format'] not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {params['output_format']}")
+    if params['full_resolution'] and params['single_line']:
+        # 骨架化需要整幅二值图，单线条模式仍使用缩放后的图像
+        logger.info("单线条模式不支持全分辨率分块处理，使用缩放后的图像")
+        params['full_resolution'] = False
+    return params
+
+
+def canonical_params(params):
+    """规范化转换参数：当前模式下不起作用的参数置为 None，等价的请求得到相同的结果缓存键"""
+    canonical = dict(params)
+    if canonical['thresholds']:
+        canonical['threshold'] = None
+    if canonical['single_line']:
+        # 单线条模式输出开放笔画，不填充
+        canonical['fill_color'] = 'none'
+    if canonical['high_precision'] != 'curve_edge':
+        canonical['curve_output'] = None
+        canonical['curve_tolerance'] = None
+    elif canonical['curve_output'] == 'spline':
+        # 直接输出样条控制点，不按容差采样
+        canonical['curve_tolerance'] = None
+    if canonical['simplify'] <= 0:
+        canonical['simplify_method'] = None
+    return canonical
+
+
+def _no_progress(stage, fraction):
+    pass
+
+
+def _trace_level(image_id, img, params, threshold, gray=None, progress=_no_progress):
+    """按单个阈值提取轮廓或中心线并逐条处理（插值、样条、简化），返回该层的数据字典
+
+    gray 为全分辨率模式下解码的原图灰度，多个阈值共用。
+    """
+    invert = params['invert']
+    single_line = params['single_line']
+    ignore_border = params['ignore_border']
+    fill_color = params['fill_color']
+    high_precision = params['high_precision']
+    curve_tolerance = params['curve_tolerance']
+    # 只有曲线边缘模式有拟合出的曲线可以直接输出
+    curve_output = params['curve_output'] if high_precision == 'curve_edge' else 'polyline'
+    simplify = params['simplify']
+    simplify_method = params['simplify_method']
+    full_resolution = gray is not None
+
+    # 1. 预处理（全分辨率模式在分块时逐条二值化）
+    progress('预处理', 0.0)
+    binary = None
+    if not full_resolution:
+        binary = preprocess(image_id, img, threshold, invert, ignore_border, single_line)
+
+    # 根据高精度模式选择轮廓近似方法
+    if high_precision.startswith('more_points_'):
+        # 模式1：增加曲线数量 - 保留所有轮廓点
+        # 提取倍数
+        factor = int(high_precision.rsplit('_', 1)[1])
+        logger.info("高精度模式：增加曲线数量，倍数=%d", factor)
+    else:
+        logger.info("高精度模式：%s", high_precision)
+
+    progress('提取轮廓', 0.1)
+    if binary is not None:
+        height, width = binary.shape[:2]
+    if single_line:
+        # 2. 单线条模式：沿骨架追踪中心线，每条笔画输出一条开放折线
+        polylines = centerlines(image_id, img, threshold, invert, ignore_border)
+        hierarchy = None
+        logger.info("笔画数量：%d", len(polylines))
+    elif full_resolution:
+        # 2. 全分辨率：按水平条带分块提取轮廓并沿接缝拼接，结果与整图提取一致
+        with timed('tiled_contours'):
+            polylines, hierarchy = tiled_contours(gray, threshold, invert, ignore_border,
+                                                  with_hierarchy=fill_color != 'none')
+        logger.info("全分辨率 %dx%d，分块轮廓数量：%d", gray.shape[1], gray.shape[0], len(polylines))
+        height, width = gray.shape
+    else:
+        # 2. 使用 OpenCV 查找轮廓 - 提取所有轮廓
+        # 不填充时使用RETR_LIST提取所有轮廓（包括内部），避免只识别边框
+        # 填充时使用RETR_CCOMP，得到外轮廓与其内部孔洞的两级层次结构
+        retrieval_mode = cv2.RETR_LIST if fill_color == 'none' else cv2.RETR_CCOMP
+        # 使用CHAIN_APPROX_SIMPLE进行轮廓近似，减少重复点（增加曲线数量模式随后插值）
+        with timed('find_contours'):
+            contours, hierarchy = cv2.findContours(binary, retrieval_mode, cv2.CHAIN_APPROX_SIMPLE)
+        logger.info("轮廓数量：%d，使用CHAIN_APPROX_SIMPLE", len(contours))
+        # 将轮廓 (N, 1, 2) 转换为 (N, 2) 点数组
+        polylines = [(contour.reshape(-1, 2).astype(np.float64), True) for contour in contours]
+
+    vertices_before = 0
+    vertices_after = 0
+
+    # 逐轮廓的阶段在本地累加耗时，循环结束后一次写入指标
+    interpolate_seconds = 0.0
+    spline_seconds = 0.0
+    simplify_seconds = 0.0
+
+    if high_precision == 'curve_edge':
+        # 模式2：曲线边缘 - 所有轮廓分批拟合样条
+        # 默认按曲率自适应采样为折线；也可以直接输出样条控制点，或合并为圆弧
+        start = time.perf_counter()
+        if curve_output == 'spline':
+            smoothed = spline_polylines(polylines)
+        elif curve_output == 'arc':
+            smoothed = arc_polylines(polylines, curve_tolerance)
+        else:
+            smoothed = smooth_curves(polylines, curve_tolerance)
+        spline_seconds += time.perf_counter() - start
+        if simplify > 0 and curve_output != 'polyline':
+            logger.info("曲线输出为 %s，不进行折线简化", curve_output)
+
+    # 遍历所有轮廓
+    shapes = []
+    kinds = []
+    for i, (points, closed) in enumerate(polylines):
+        progress('处理轮廓', 0.2 + 0.6 * i / len(polylines))
+        # 高精度模式处理
+        if high_precision.startswith('more_points_') and len(points) > 2:
+            # 模式1：增加曲线数量 - 插值增加点数
+            # 使用从参数中提取的倍数
+            factor = int(high_precision.rsplit('_', 1)[1])
+            start = time.perf_counter()
+            points = interpolate_points(points, factor=factor, closed=closed)
+            interpolate_seconds += time.perf_counter() - start
+        kind = 'polyline'
+        if high_precision == 'curve_edge':
+            # 少于3个点的轮廓没有拟合样条，仍按折线输出
+            if curve_output != 'polyline' and len(points) > 2:
+                kind = curve_output
+            points = smoothed[i]
+
+        # 过滤太短的轮廓（噪点）：闭合轮廓至少3个点，开放笔画至少2个点；两段圆弧即可闭合
+        min_points = 3 if closed and kind != 'arc' else 2
+
+        # 折线简化：按容差删除冗余顶点（样条控制点与圆弧不参与简化）
+        if len(points) >= min_points:
+            vertices_before += len(points)
+        if simplify > 0 and kind == 'polyline':
+            start = time.perf_counter()
+            points = simplify_polyline(points, simplify, method=simplify_method, closed=closed)
+            simplify_seconds += time.perf_counter() - start
+
+        kinds.append(kind)
+        if len(points) >= min_points:
+            shapes.append(points)
+            vertices_after += len(points)
+        else:
+            shapes.append(None)
+
+    if interpolate_seconds:
+        add_time('interpolate', interpolate_seconds)
+    if spline_seconds:
+        add_time('spline', spline_seconds)
+    if simplify_seconds:
+        add_time('simplify', simplify_seconds)
+
+    # 单线条模式输出的是开放笔画，没有可填充的区域
+    if fill_color == 'none' or hierarchy is None:
+        hierarchy = None
+    else:
+        hierarchy = hierarchy[0]
+    return {
+        'threshold': threshold,
+        'shapes': shapes,
+        'kinds': kinds,
+        'polylines': polylines,
+        'hierarchy': hierarchy,
+        'width': width,
+        'height': height,
+        'vertices_before': vertices_before,
+        'vertices_after': vertices_after,
+    }
+
+
+_level_executor = None
+_level_executor_lock = threading.Lock()
+
+
+def _get_level_executor(workers):
+    """本进程共用的分层线程池，首次使用时按 workers 创建"""
+    global _level_executor
+    with _level_executor_lock:
+        if _level_executor is None:
+            _level_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='level')
+        return _level_executor
+
+
+def _trace_levels(image_id, img, params, thresholds, gray, progress, workers):
+    """多阈值分层：各阈值在进程共用的线程池中并行处理，共用解码与灰度化结果
+
+    OpenCV 与 NumPy 在计算时释放 GIL。每层的指标单独收集，在调用线程中汇总。
+    各层进度取平均后上报，保证总进度单调不减。
+    """
+    fractions = [0.0] * len(thresholds)
+    progress_lock = threading.Lock()
+
+    def run(i, threshold):
+        def level_progress(stage, fraction):
+            with progress_lock:
+                fractions[i] = max(fractions[i], fraction)
+                progress(f'{stage}（阈值 {threshold}）', sum(fractions) / len(fractions))
+        with collect() as level_metrics:
+            level = _trace_level(image_id, img, params, threshold, gray, level_progress)
+        return level, level_metrics
+
+    executor = _get_level_executor(workers)
+    futures = [executor.submit(run, i, t) for i, t in enumerate(thresholds)]
+    try:
+        results = [future.result() for future in futures]
+    except BaseException:
+        # 任一层失败或任务被取消时，不再开始其余的层，并等待已开始的层结束
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        raise
+
+    levels = []
+    for i, (level, level_metrics) in enumerate(results):
+        for stage, seconds in level_metrics.stages.items():
+            add_time(stage, seconds)
+        for name, n in level_metrics.counts.items():
+            count(name, n)
+        level['layer'] = level_layer(level['threshold'])
+        level['color'] = LEVEL_LAYER_COLORS[i % len(LEVEL_LAYER_COLORS)]
+        levels.append(level)
+    return levels
+
+
+def convert(image_id, img, params, source=None, progress=None, level_workers=None):
+    """执行矢量化，返回 (doc, stats)
+
+    params 为 parse_convert_params 的结果；全分辨率模式需要 source（原始上传字节）。
+    params['thresholds'] 非空时每个阈值输出到单独的图层（level_layer），各层并行处理，
+    level_workers 为本进程分层线程池的大小（默认 LEVEL_WORKERS）。
+    progress(stage, fraction) 在各阶段报告进度，回调抛出异常即可中止转换。
+    """
+    progress = progress or _no_progress
+    thresholds = params['thresholds']
+    simplify = params['simplify']
+    simplify_method = params['simplify_method']
+
+    gray = None
+    if params['full_resolution']:
+        # 全分辨率模式解码原图灰度，各阈值共用
+        with timed('decode_full'):
+            gray = cv2.imdecode(np.frombuffer(source, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("无法解码图片")
+
+    if thresholds:
+        levels = _trace_levels(image_id, img, params, thresholds, gray, progress, level_workers or LEVEL_WORKERS)
+        logger.info("多阈值分层：%s", ', '.join(str(t) for t in thresholds))
+    else:
+        level = _trace_level(image_id, img, params, params['threshold'], gray, progress)
+        level['layer'] = OUTPUT_LAYER
+        level['color'] = 7
+        levels = [level]
+    del gray
+    width, height = levels[0]['width'], levels[0]['height']
+
+    # 3. 生成 DXF
+    progress('生成DXF', 0.8)
+    hatch_color = None
+    if params['fill_color'] != 'none':
+        hatch_color = 0 if params['fill_color'] == 'black' else 7  # white
+    # 没有样条且输出为 ASCII DXF 时直接输出组码，其余情况使用 ezdxf
+    direct = (DIRECT_DXF_WRITER and params['output_format'] in DIRECT_DXF_FORMATS
+              and not any('spline' in level['kinds'] for level in levels))
+    build = _build_direct_document if direct else _build_ezdxf_document
+    with timed('dxf_build'):
+        doc, total_hatches = build(levels, hatch_color, width, height)
+    if hatch_color is not None:
+        logger.info("填充区域数量：%d", total_hatches)
+    total_curves = sum(points is not None for level in levels for points in level['shapes'])
+    vertices_before = sum(level['vertices_before'] for level in levels)
+    vertices_after = sum(level['vertices_after'] for level in levels)
+
+    logger.info("OpenCV found %d contours.", total_curves)
+    if simplify > 0:
+        logger.info("折线简化(%s, 容差=%spx)：顶点数 %d -> %d",
+                    simplify_method, simplify, vertices_before, vertices_after)
+    count('contours', sum(len(level['polylines']) for level in levels))
+    count('curves', total_curves)
+    count('vertices_before', vertices_before)
+    count('vertices_after', vertices_after)
+
+    stats = {
+        'curves': total_curves,
+        'vertices_before': vertices_before,
+        'vertices_after': vertices_after,
+    }
+    if thresholds:
+        stats['layers'] = [
+            {'threshold': level['threshold'], 'layer': level['layer'],
+             'curves': sum(points is not None for points in level['shapes'])}
+            for level in levels
+        ]
+    return doc, stats
+
+
+def convert_to_file(image_id, img, params, source, path, progress=None):
+    """执行矢量化并按 params['output_format'] 把结果写入 path，返回统计信息（供任务进程池调用）
+
+    任务进程中没有请求上下文，指标在此收集并随统计信息一起返回主进程。
+    """
+    with collect() as metrics:
+        doc, stats = convert(image_id, img, params, source=source, progress=progress,
+                             level_workers=JOB_LEVEL_WORKERS)
+        if progress:
+            progress('写入文件', 0.9)
+        with timed('dxf_serialize'), open(path, 'wb') as f:
+            write_document(doc, f, params['output_format'])
+        count('dxf_bytes', os.path.getsize(path))
+        count('peak_rss_bytes', peak_rss_bytes())
+    stats['metrics'] = metrics.as_dict()
+    stats['output_format'] = params['output_format']
+    return stats
+
+
+def convert_image_file(data, params, path, progress=None):
+    """解码原始图片字节并矢量化到 path（批量转换在工作进程中调用）"""
+    image_id = hashlib.sha256(data).hexdigest()
+    img = decode_image(data)
+    source = data if params['full_resolution'] else None
+    return convert_to_file(image_id, img, params, source, path, progress=progress)